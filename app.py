@@ -1,34 +1,59 @@
-from dash import callback_context as ctx
+import time
+T_IMPORT = time.time()      # start of the cold-start clock (includes the imports below)
+from dash import callback_context as ctx, ClientsideFunction, no_update
 from dash.exceptions import PreventUpdate
 from dash_extensions.enrich import DashProxy, Output, Input, State, html, dcc, dash_table, ServersideOutput, ServersideOutputTransform
 import dash_bootstrap_components as dbc
-import plotly.express as px
-import plotly.graph_objects as go
 import pandas as pd
+import numpy as np
 import os, pathlib
-import time
+import contextlib
+import json
+import threading
+import traceback
+import flask
+from name_index import NameIndex, normalize_name
+from schema import DataSchema
+import wage_engine
+import figures
+from data_store import datasets, dataset_version, BoundedFileSystemStore
+from columnar import load_columnar
+from pay_matrix import PayMatrix, PayBlock
+from ingest import aggregate_duplicates, read_manifest, read_artifact
+from figure_model import FigureModel, factor_trace
+from result_cache import ResultCache, query_key
+from single_flight import SingleFlight
+from directory import EmployeeDirectory, table_columns
+from population import percentile_bands, percentile_bands_from_dataset
+from raises import RaiseEngine
+from jobs import JobManager
+from metrics import metrics
+import memory
+
+IMPORTS_TIME = round(time.time() - T_IMPORT, 3)
 
-app = DashProxy(__name__, transforms=[ServersideOutputTransform()], external_stylesheets=[dbc.themes.FLATLY], assets_folder='assets')
+# define paths
+APP_PATH = str(pathlib.Path(__file__).parent.resolve())
+
+# serverside cache only holds small per-session results (the base datasets are shared, see data_store.datasets)
+# UC_WAGES_CACHE_BUDGET_MB overrides the byte bound (the store evicts above it, see data_store.py)
+SERVERSIDE_CACHE_DIR = os.path.join(APP_PATH, "file_system_store")
+SERVERSIDE_CACHE_MAX_BYTES = float(os.environ.get("UC_WAGES_CACHE_BUDGET_MB", "512"))*1024*1024
+SERVERSIDE_CACHE_MAX_ENTRIES = 2000
+SERVERSIDE_CACHE_TTL = 60*60      # seconds
+serverside_store = BoundedFileSystemStore(SERVERSIDE_CACHE_DIR, max_bytes=SERVERSIDE_CACHE_MAX_BYTES, threshold=SERVERSIDE_CACHE_MAX_ENTRIES, default_timeout=SERVERSIDE_CACHE_TTL)
+
+app = DashProxy(__name__, transforms=[ServersideOutputTransform(backend=serverside_store)], external_stylesheets=[dbc.themes.FLATLY], assets_folder='assets')
 server = app.server
 
 app.title = "UC Employee Wages Dashboard"
 
-# define paths
-APP_PATH = str(pathlib.Path(__file__).parent.resolve())
-
-# create schemas so that you don't need to remember the labels when coding
-class DataSchema:
-    NAME = "Employee Name"
-    JOB = "Job Title"
-    JOB_ABBREVIATED = "Abbreviated Job Title"
-    TOTAL_PAY = 'Total Pay'
-    TOTAL_PAY_AND_BENEFITS = 'Total Pay & Benefits'
-    PAY = 'Total Pay & Benefits'
-    YEAR = "Year"
-    PRIORPAY = "Prior Year Pay"
-    ADJUSTMENT = "Adjustment"
-    CUMADJUSTMENT = "Cumulative Adjustment"
-    PROJECTEDPAY = "Projected Pay"
+# per-callback latency/payload histograms on /metrics (see metrics.py)
+# set UC_WAGES_SLOW_CALLBACK_MS to log every callback slower than that
+if os.environ.get("UC_WAGES_SLOW_CALLBACK_MS"):
+    metrics.slow_ms = float(os.environ["UC_WAGES_SLOW_CALLBACK_MS"])
+metrics.init_app(app)
+metrics.extra['serverside_cache'] = serverside_store.get_stats
 
 class ids:
     PROJECTED_WAGES_LINE_PLOT = "projected-wages-line-plot"
@@ -39,6 +64,8 @@ class ids:
     INITIAL_WAGE_DROPDOWN = "initial-wage-dropdown"
     INITIAL_WAGE_INPUT = "initial-wage-input"
     LOLLIPOP_CHART = "lollipop-chart"
+    RAISE_CHART = "raise-chart"
+    LARGEST_RAISES_TABLE = "largest-raises-table"
     NAME_SEARCH_CONTAINER = "name-search-container"
     NAME_SEARCH_INPUT = "name-search-input"
     NAME_SEARCH_BUTTON = "name-search-button"
@@ -52,50 +79,282 @@ class ids:
     YEAR_RANGE_SLIDER = "year-range-slider"
     INITIAL_WAGE_CONTAINER = 'initial-wage-container'
 
-class colors:
-    PLOT_BACKGROUND_COLOR = "#eaf1f5"
-    END_MARKER_COLOR = "#355218"
-    START_MARKER_COLOR = "#759356"
-    LOLLIPOP_LINE_COLOR = "#7B7B7B"
-    GRID_LINES_COLOR = "#C5CCCA"
-
 JOB_DATA_PATH =  os.path.join(APP_PATH, "assets", "salaries_by_job.csv")
+JOB_ARTIFACT_PATH = os.path.join(APP_PATH, "assets", "salaries_by_job.parquet")
 NAME_DATA_PATH =  os.path.join(APP_PATH, "assets", "salaries_by_name.parquet")
-
-t0 = time.time()
-print('reading csv 1:')
-
-# load data
-#df_jobs = pd.read_parquet(JOB_DATA_PATH, engine='fastparquet')     # need to create parquet file first
-cat_type = pd.api.types.CategoricalDtype(categories=[2011,2012,2013,2014,2015,2016,2017,2018,2019,2020,2021], ordered=True)
-df_jobs = pd.read_csv(JOB_DATA_PATH, 
-    usecols=[
-        DataSchema.NAME,
-        DataSchema.TOTAL_PAY,
-        DataSchema.TOTAL_PAY_AND_BENEFITS,
-        DataSchema.YEAR],
-    dtype={
-        DataSchema.NAME: "category",
-        DataSchema.TOTAL_PAY: float,
-        DataSchema.TOTAL_PAY_AND_BENEFITS: float,
-        DataSchema.YEAR: cat_type
+COLUMNAR_DATA_DIR = os.path.join(APP_PATH, "assets", "columnar")
+
+# 'memory': every process parses its own copy of the data, 'mmap': memory-mapped columnar files shared across gunicorn workers
+# (the structures derived from the frame are still per worker heap, see columnar.py),
+# 'disk': df_names is never loaded, selected names are read from the parquet artifact on demand (needs build_data.py)
+DATA_MODE = os.environ.get("UC_WAGES_DATA_MODE", "memory")
+NAME_CACHE_SIZE = 1024          # entities kept in memory in 'disk' mode
+
+# 'eager': load the data while importing app.py, 'background': serve the layout right away and load the data in a thread
+# (readiness is reported by /ready; background mode needs gunicorn's preload_app off, threads do not survive the fork)
+# 'external': nothing is loaded, the caller installs its own datasets (benchmarks/bench_callbacks.py)
+STARTUP_MODE = os.environ.get("UC_WAGES_STARTUP_MODE", "eager")
+DATA_READY_TIMEOUT = 300        # seconds a callback waits for the data before giving up
+
+# built by build_data.py (None if the assets are the hand-made csv/parquet files)
+manifest = read_manifest(os.path.join(APP_PATH, "assets"))
+
+# opt-in: above this many names, the lollipop chart shows the top names and collapses the rest into one
+# "remaining" row; unset (None) shows every name, as before
+LOLLIPOP_TOP_N = int(os.environ["UC_WAGES_LOLLIPOP_TOP_N"]) if os.environ.get("UC_WAGES_LOLLIPOP_TOP_N") else None
+
+# name search as you type (see search_names)
+MIN_TYPEAHEAD_LENGTH = 3        # shorter queries only search on the button (they have no trigram to look up)
+SEARCH_DEBOUNCE = 0.3           # seconds a typed query waits before searching (a newer keystroke cancels it)
+MAX_SEARCH_MATCHES = 2000       # exact matches kept per search; a query matching more is reported as "more than"
+FUZZY_FILL = 20                 # misspelled (ranked) matches appended when there are fewer exact matches than this
+SEARCH_PAGE_SIZE = 10
+
+# identical concurrent search/filter requests share one computation (see single_flight.py)
+# set UC_WAGES_SINGLE_FLIGHT_DIR to a local directory to coalesce across gunicorn workers too
+flights = SingleFlight(os.environ.get("UC_WAGES_SINGLE_FLIGHT_DIR"))
+
+# name search and figure building run in a local job pool (see jobs.py), the browser polls for the result
+# the pool is threads in the web worker: it frees the request threads while jobs wait (data load, cache, disk), but
+# CPU-bound python in a job still competes with them for the GIL
+# UC_WAGES_JOB_WORKERS = pool threads per gunicorn worker
+JOB_DIR = os.path.join(APP_PATH, "background_jobs")
+JOB_WORKERS = int(os.environ.get("UC_WAGES_JOB_WORKERS", "2"))
+JOB_POLL_INTERVAL = 250         # ms
+jobs = JobManager(JOB_DIR, max_workers = JOB_WORKERS)
+
+# figure data shared across sessions (see result_cache.py); the default view is computed at startup
+RESULT_CACHE_MAX_BYTES = 64*1024*1024
+DEFAULT_JOBS = ['GSR (Step 1)', 'GSR (Step 4)', 'GSR (Step 7)', 'GSR (Step 10)']
+DEFAULT_COMPENSATION = DataSchema.TOTAL_PAY_AND_BENEFITS
+result_cache = ResultCache(RESULT_CACHE_MAX_BYTES)
+metrics.extra['result_cache'] = result_cache.get_stats
+metrics.extra['single_flight'] = lambda: dict(flights.stats)
+
+YEARS = manifest['years'] if manifest is not None else [2011,2012,2013,2014,2015,2016,2017,2018,2019,2020,2021]
+cat_type = pd.api.types.CategoricalDtype(categories=YEARS, ordered=True)
+
+# ------------- startup / data loading ----------------
+# globals filled in by load_data()
+df_jobs = None
+df_names = None
+name_index = None
+employee_directory = None       # one summary row per employee, for the search results table
+names_store = None      # DiskNameStore in 'disk' mode
+
+data_ready = threading.Event()
+load_finished = threading.Event()       # set whether the load succeeded or not, so waiting callbacks don't hang on a failure
+startup_error = None
+startup_timings = {'imports': IMPORTS_TIME}
+ingest_reports = {}            # rows merged per dataset (see ingest.aggregate_duplicates)
+
+@contextlib.contextmanager
+def startup_phase(phase):
+    t0 = time.time()
+    print(phase + ':')
+    yield
+    startup_timings[phase] = round(time.time() - t0, 3)
+    print(startup_timings[phase])
+
+def read_jobs_csv():
+    df_jobs = pd.read_csv(JOB_DATA_PATH, 
+        usecols=[
+            DataSchema.NAME,
+            DataSchema.TOTAL_PAY,
+            DataSchema.TOTAL_PAY_AND_BENEFITS,
+            DataSchema.YEAR],
+        dtype={
+            DataSchema.NAME: "category",
+            DataSchema.TOTAL_PAY: float,
+            DataSchema.TOTAL_PAY_AND_BENEFITS: float,
+            DataSchema.YEAR: cat_type
+        }
+    )
+    # rename the compensation column (either Total Pay or Total Pay and Benefits) to compensation
+    #df_jobs = df_jobs.rename(columns={compensation_type: DataSchema.PAY})
+    df_jobs, ingest_reports['jobs'] = aggregate_duplicates(df_jobs, cat_type)
+    return df_jobs
+
+def figure_data(combined_block):
+    # everything update_figures sends that depends only on the query, not on the session's figures
+    names_wanted_in_real_wages = combined_block.names[combined_block.has_data()]
+    names_wanted_in_projected_wages = combined_block.names[combined_block.spanning()]       # has both min and max year
+    with metrics.section('pandas'):
+        real_wages = wage_engine.real_wages(combined_block, names_wanted_in_real_wages)
+        adjustment_factors = wage_engine.adjustment_factors(combined_block, names_wanted_in_projected_wages)
+    with metrics.section('figures'):
+        lollipop = figures.build_lollipop(combined_block, names_wanted_in_projected_wages, top_n = LOLLIPOP_TOP_N).to_dict()
+    return {
+        'real_wages': real_wages,
+        'adjustment_factors': adjustment_factors,
+        'lollipop': lollipop,
     }
-)
-# rename the compensation column (either Total Pay or Total Pay and Benefits) to compensation
-#df_jobs = df_jobs.rename(columns={compensation_type: DataSchema.PAY})
-print(time.time() - t0)
 
-t0 = time.time()
-print('reading csv 2:')
-df_names = pd.read_parquet(NAME_DATA_PATH, engine='fastparquet')
-print(time.time() - t0)
+def figure_data_key(combined_block, years):
+    return query_key([datasets.version('jobs'), datasets.version('names')], combined_block.labels(), years, combined_block.column)
+
+def cached_figure_data(combined_block, years):
+    key = figure_data_key(combined_block, years)
+    value = result_cache.get(key)
+    if value is None:
+        # concurrent misses for the same view (any session) compute it once; the leader checks the cache again first
+        value = flights.do(('figure_data',) + key, lambda: result_cache.get_or_compute(key, lambda: figure_data(combined_block)))
+    return value
+
+def load_data():
+    global df_jobs, df_names, name_index, employee_directory, names_store, startup_error
+    try:
+        with startup_phase('reading csv 1'):
+            if manifest is not None:
+                df_jobs = read_artifact(JOB_ARTIFACT_PATH, cat_type)
+                ingest_reports.update(manifest['ingest'])       # merged when the artifacts were built
+            else:
+                df_jobs = read_jobs_csv()
+
+        with startup_phase('reading csv 2'):
+            def read_names():
+                if manifest is not None:
+                    return read_artifact(NAME_DATA_PATH, cat_type)
+                df, ingest_reports['names'] = aggregate_duplicates(pd.read_parquet(NAME_DATA_PATH, engine='fastparquet'), cat_type)
+                return df
+
+            if DATA_MODE == 'disk':
+                # df_names stays on disk, only the name/year columns are read (for the name index)
+                if manifest is None:
+                    raise ValueError("UC_WAGES_DATA_MODE=disk needs the name-sorted artifacts from build_data.py")
+                from disk_store import DiskNameStore        # deferred: pulls in pyarrow.dataset
+                names_store = DiskNameStore(NAME_DATA_PATH, YEARS, cache_size = NAME_CACHE_SIZE)
+                metrics.extra['names_store'] = lambda: dict(names_store.stats)
+                df_names_index = names_store.index_frame()
+            elif DATA_MODE == 'mmap':
+                # columnar copy of the parquet file (duplicates already merged), memory-mapped so that all workers share the same pages
+                df_names = load_columnar(COLUMNAR_DATA_DIR, dataset_version(NAME_DATA_PATH), read_names, YEARS)
+            else:
+                df_names = read_names()
 
-print('size of df_names_filtered:')
-print(df_names.info(memory_usage = 'deep'))
+        with startup_phase('registering shared datasets'):
+            datasets.register('jobs', df_jobs, dataset_version(JOB_ARTIFACT_PATH if manifest is not None else JOB_DATA_PATH))
+            datasets.register('names', df_names, dataset_version(NAME_DATA_PATH))
 
-t0 = time.time()
+        with startup_phase('building pay matrices'):
+            datasets.add_derived('jobs', 'matrix', PayMatrix.from_frame(df_jobs, YEARS))
+            datasets.add_derived('jobs', 'wages', datasets.derived(datasets.ref('jobs'), 'matrix').to_records())
+            if DATA_MODE == 'disk':
+                datasets.add_derived('names', 'matrix', names_store)       # same select() interface, reads from disk
+            else:
+                datasets.add_derived('names', 'matrix', PayMatrix.from_frame(df_names, YEARS))
+
+        with startup_phase('building name index'):
+            name_index = NameIndex.from_frame(df_names_index if DATA_MODE == 'disk' else df_names, DataSchema.NAME, DataSchema.YEAR, YEARS)
 
+        with startup_phase('building employee directory'):
+            if DATA_MODE == 'disk':
+                employee_directory = EmployeeDirectory.from_disk(names_store, name_index.years_mask)
+            else:
+                employee_directory = EmployeeDirectory.from_matrix(datasets.derived(datasets.ref('names'), 'matrix'), name_index.years_mask)
+
+        with startup_phase('computing population bands'):
+            # UC-wide pay percentiles per year, from the manifest when build_data.py already computed them
+            if (manifest is not None) and ('bands' in manifest):
+                bands = manifest['bands']
+            elif DATA_MODE == 'disk':
+                bands = percentile_bands_from_dataset(names_store.dataset, YEARS)
+            else:
+                bands = percentile_bands(df_names, YEARS)
+            datasets.add_derived('names', 'bands', bands)
 
+        with startup_phase('preparing raise summaries'):
+            # each year range is summarized once on first use (disk mode reads just the two years from the artifact)
+            if DATA_MODE == 'disk':
+                datasets.add_derived('names', 'raises', RaiseEngine.from_disk(names_store))
+            else:
+                datasets.add_derived('names', 'raises', RaiseEngine.from_matrix(datasets.derived(datasets.ref('names'), 'matrix')))
+
+        with startup_phase('precomputing default view'):
+            default_block = datasets.derived(datasets.ref('jobs'), 'matrix').select(DEFAULT_JOBS, DEFAULT_COMPENSATION).tagged('jobs')
+            cached_figure_data(default_block.year_range(YEARS[0], YEARS[-1]), [YEARS[0], YEARS[-1]])
+            datasets.derived(datasets.ref('names'), 'raises').summary(DEFAULT_COMPENSATION, YEARS[0], YEARS[-1])
+        data_ready.set()
+    except Exception as e:
+        startup_error = repr(e)
+        traceback.print_exc()
+        raise
+    finally:
+        startup_timings['total'] = round(time.time() - T_IMPORT, 3)
+        print('startup timings (s): ' + json.dumps(startup_timings))
+        print('ingest reports: ' + json.dumps(ingest_reports))
+        load_finished.set()
+
+def wait_for_data():
+    # callbacks that need the data block here until the background load is done, and fail right away if it failed
+    if not load_finished.wait(timeout = DATA_READY_TIMEOUT):
+        raise PreventUpdate
+    if startup_error is not None:
+        raise RuntimeError('data failed to load: ' + startup_error)
+
+@server.route("/ready")
+def ready():
+    status = {'ready': data_ready.is_set(), 'mode': STARTUP_MODE, 'error': startup_error, 'timings': startup_timings, 'ingest': ingest_reports}
+    if startup_error is not None:
+        return flask.jsonify(status), 500
+    return flask.jsonify(status), (200 if data_ready.is_set() else 503)
+
+# ------------- memory accounting ----------------
+# GET /memory reports dataset/index/cache sizes, serverside cache writes per callback and RSS (see memory.py);
+# POST /memory also trims whatever is over budget
+# optional RSS budget in MB (UC_WAGES_RSS_BUDGET_MB): over it, the result cache (and the disk-mode name cache) are dropped
+# the serverside cache budget is the store's own bound (SERVERSIDE_CACHE_MAX_BYTES), so the report and the store agree
+MEMORY_BUDGETS = {'serverside_cache_bytes': serverside_store.max_bytes}
+if os.environ.get('UC_WAGES_RSS_BUDGET_MB'):
+    MEMORY_BUDGETS['rss_bytes'] = float(os.environ['UC_WAGES_RSS_BUDGET_MB'])*1024*1024
+MEMORY_CHECK_EVERY = 200        # callback requests between budget checks
+n_callback_requests = 0
+
+def memory_report(datasets_too = True):
+    # datasets_too = False: only what the budgets need (walking the name index is O(names))
+    report = {
+        'mode': DATA_MODE,
+        'caches': {'result_cache_bytes': result_cache.get_stats()['bytes'], 'serverside_cache_bytes': serverside_store.total_bytes()},
+        'callback_cache_writes': memory.callback_cache_writes(metrics),
+        'process': memory.process_memory(),
+    }
+    if datasets_too:
+        matrices = {dataset_id: datasets.derived(datasets.ref(dataset_id), 'matrix') for dataset_id in ['jobs', 'names']} if data_ready.is_set() else {}
+        report['datasets'] = {'jobs': memory.frame_memory(df_jobs), 'names': memory.frame_memory(df_names)}
+        report['matrices'] = {dataset_id: memory.matrix_memory(matrix) for dataset_id, matrix in matrices.items()}
+        report['name_index'] = memory.name_index_memory(name_index)
+        report['directory'] = memory.directory_memory(employee_directory)
+    return report
+
+def budget_caches():
+    return [result_cache] + ([names_store] if names_store is not None else [])
+
+@server.route("/memory", methods=['GET', 'POST'])
+def memory_endpoint():
+    report = memory_report()
+    report['budgets'] = MEMORY_BUDGETS
+    if flask.request.method == 'POST':
+        report['exceeded'] = memory.enforce_budgets(report, MEMORY_BUDGETS, budget_caches(), serverside_store)
+    else:
+        report['exceeded'] = memory.check_budgets(report, MEMORY_BUDGETS)
+    return flask.jsonify(report)
+
+@server.after_request
+def check_memory_budgets(response):
+    global n_callback_requests
+    # only the RSS budget needs a periodic check, the store already evicts above its bound on every write
+    if ('rss_bytes' in MEMORY_BUDGETS) and flask.request.path.endswith('/_dash-update-component'):
+        n_callback_requests += 1
+        if n_callback_requests % MEMORY_CHECK_EVERY == 0:
+            memory.enforce_budgets(memory_report(datasets_too = False), MEMORY_BUDGETS, budget_caches(), serverside_store)
+    return response
+
+if STARTUP_MODE == 'background':
+    threading.Thread(target=load_data, name='load-data', daemon=True).start()
+elif STARTUP_MODE != 'external':
+    load_data()
+
+t0 = time.time()
 
 
 # df_names = pd.read_csv(NAME_DATA_PATH,
@@ -119,7 +378,7 @@ t0 = time.time()
 print('creating html components:')
 # ------------- create html components --------------------
 # better way to do this? this is faster than reading a df
-unique_jobs = ['GSR (Step 1)', 'GSR (Step 2)', 'GSR (Step 3)', 'GSR (Step 4)', 'GSR (Step 5)', 'GSR (Step 6)', 'GSR (Step 7)', 'GSR (Step 8)', 'GSR (Step 9)', 'GSR (Step 10)', 'UC President']        
+unique_jobs = manifest['jobs'] if manifest is not None else ['GSR (Step 1)', 'GSR (Step 2)', 'GSR (Step 3)', 'GSR (Step 4)', 'GSR (Step 5)', 'GSR (Step 6)', 'GSR (Step 7)', 'GSR (Step 8)', 'GSR (Step 9)', 'GSR (Step 10)', 'UC President']        
 initial_wage_container = html.Div(
         id = ids.INITIAL_WAGE_CONTAINER,
         className = 'dropdown-container',
@@ -150,7 +409,7 @@ job_container = html.Div(
         dcc.Dropdown(
             id=ids.RATE_JOB_DROPDOWN,
             options=unique_jobs,
-            value=['GSR (Step 1)', 'GSR (Step 4)', 'GSR (Step 7)', 'GSR (Step 10)'],
+            value=DEFAULT_JOBS,
             multi=True
         )
     ]
@@ -177,23 +436,11 @@ year_range_container = html.Div(
     className='dropdown-container',
     children = [
         dcc.RangeSlider(
-            min = 2011, 
-            max = 2021, 
+            min = YEARS[0], 
+            max = YEARS[-1], 
             step = 1,
-            value = [2011, 2021],
-            marks = {
-                2011: '2011',
-                2012: '2012',
-                2013: '2013',
-                2014: '2014',
-                2015: '2015',
-                2016: '2016',
-                2017: '2017',
-                2018: '2018',
-                2019: '2019',
-                2020: '2020',
-                2021: '2021'
-            },
+            value = [YEARS[0], YEARS[-1]],
+            marks = {year: str(year) for year in YEARS},
             id = ids.YEAR_RANGE_SLIDER
         )
     ]
@@ -205,15 +452,32 @@ name_search_container = html.Div(
         id = ids.NAME_SEARCH_CONTAINER,
         children = [
             html.Label('Enter name:'),
-            dcc.Input(id = ids.NAME_SEARCH_INPUT),
+            dcc.Input(id = ids.NAME_SEARCH_INPUT, debounce = False),       # searches as you type (debounced by the job manager, see search_names)
             html.Button('Search', id = ids.NAME_SEARCH_BUTTON, className='button'),
         ]
 )
 
+# the table pages and sorts on the server (page_action/sort_action 'custom'), only one page of rows is ever sent
 name_search_results_container = html.Div(
     id = ids.NAME_SEARCH_RESULTS_CONTAINER,
     children = [
-        dash_table.DataTable(id = ids.NAME_SEARCH_RESULTS_TABLE),
+        html.Label('Select a name to add to the plots', id = 'name-search-status'),
+        # only the table shows a spinner: the input and status label update on every keystroke and job poll,
+        # and dcc.Loading hides all of its children while any of them is loading
+        dcc.Loading(
+            dash_table.DataTable(
+                id = ids.NAME_SEARCH_RESULTS_TABLE,
+                columns = table_columns(),
+                data = [],
+                page_action = 'custom',
+                page_current = 0,
+                page_size = SEARCH_PAGE_SIZE,
+                page_count = 1,
+                sort_action = 'custom',
+                sort_mode = 'single',
+                sort_by = [],
+            ),
+        ),
     ]
 )
 
@@ -228,6 +492,11 @@ name_add_container = html.Div(
     ]
 )
 
+# ------------- largest raises table ----------------
+largest_raises_columns = [{'name': DataSchema.NAME, 'id': DataSchema.NAME}]
+largest_raises_columns += [{'name': label, 'id': column, 'type': 'numeric', 'format': {'specifier': '$,.0f'}} for label, column in [('First Year', 'start'), ('Last Year', 'end'), ('Raise', 'absolute')]]
+largest_raises_columns += [{'name': 'Raise (%)', 'id': 'percent', 'type': 'numeric', 'format': {'specifier': '.1f'}}]
+
 
 t0 = time.time()
 print('creating layout:')
@@ -241,11 +510,22 @@ app.layout = html.Div(
         dcc.Store(id='filtered-jobs-data'),
         dcc.Store(id='filtered-combined-data'),
         dcc.Store(id='jobs-data'),
+        dcc.Store(id='job-wages'),
         dcc.Store(id='names-data'),
         dcc.Store(id='table-data-records-list'),
         dcc.Store(id='traces-in-real-wages'),
         dcc.Store(id='traces-in-projected-wages'),
+        dcc.Store(id='real-wages-delta'),
+        dcc.Store(id='projected-wages-delta'),
+        dcc.Store(id='real-wages-resync'),
+        dcc.Store(id='projected-wages-resync'),
+        dcc.Store(id='real-wages-bands'),
         dcc.Store(id='schema-class'),
+        dcc.Store(id='search-job'),
+        dcc.Store(id='search-results'),
+        dcc.Store(id='figures-job'),
+        dcc.Interval(id='search-job-interval', interval=JOB_POLL_INTERVAL, disabled=True),
+        dcc.Interval(id='figures-job-interval', interval=JOB_POLL_INTERVAL, disabled=True),
        
         html.Header(
             className = "title-container",
@@ -294,7 +574,7 @@ app.layout = html.Div(
                 ),
                 dbc.AccordionItem(
                     children = [
-                        dcc.Loading(
+                        html.Div(
                                 id = 'name-container',
                                 children = [
                                     name_search_container,
@@ -314,6 +594,11 @@ app.layout = html.Div(
         html.Hr(),
         html.H4('How does your compensation stack up against other UC employees?'),
         html.H6('Hover around a data point to compare the compensation of all plotted employees for that year.'),
+        dcc.Checklist(
+            options = [{'label': ' Show UC-wide percentiles (10th-90th)', 'value': 'bands'}],
+            value = [],
+            id = 'population-bands-checklist'
+        ),
         dcc.Graph(id=ids.REAL_WAGES_LINE_PLOT, config={'displayModeBar': False}),
         html.Hr(),
         html.H4('Ever wonder what your compensation might be if it grew at the same rate as your peers or bosses?'), 
@@ -325,6 +610,17 @@ app.layout = html.Div(
         html.H6('The following plot displays the absolute change in compensation over the selected time range. By comparing the length of the line connecting the dots, you can get a sense of the absolute change in compensation between the employees.'),
         dcc.Graph(id=ids.LOLLIPOP_CHART, config={'displayModeBar': False}),
         html.Hr(),
+        html.H4('How are raises distributed across all UC employees?'),
+        html.H6('Raises over the selected years for every employee paid in both the first and last year, grouped by how much they made in the first year. Hover over a bar for the percentage-based raise of that group.'),
+        dcc.Graph(id=ids.RAISE_CHART, config={'displayModeBar': False}),
+        html.Label('Largest raises over the selected years'),
+        dash_table.DataTable(
+            id = ids.LARGEST_RAISES_TABLE,
+            columns = largest_raises_columns,
+            data = [],
+            page_size = 10,
+        ),
+        html.Hr(),
         html.H6('Even among graduate student researchers, applying the same percentage-based raises across all payscales breeds inequity. From 2011 to 2021, the lowest-paid graduate student researchers saw a $5k increase while the highest-paid saw a $10k increase (shown in the default plots).'),
         html.H6('However, this is nothing compared to the massive raises (in absolute dollar terms) of employees with vastly greater earnings (add UC President to the plots, for example).'),
         html.H6("For whatever reason, we tend to talk about raises as a percentage of our previous year's income. By making this our point of reference, we benefit individuals who are already making more by giving them disproportionately larger raises in terms of absolute dollars. Compounded year after year, this inequity becomes exorbitant."),
@@ -347,7 +643,8 @@ app.layout = html.Div(
     ]
 )
 
-print(time.time() - t0)
+startup_timings['creating layout'] = round(time.time() - t0, 3)
+print(startup_timings['creating layout'])
 #--------------- callback - dropdown -------
 # also - dsiable/enable refresh plot
 @app.callback(
@@ -355,7 +652,7 @@ print(time.time() - t0)
     Input('select-compensation-dropdown','value'),
     prevent_initial_call = True,       # want to load in background
 )
-def save_datastore(compensation_type):
+def update_compensation(compensation_type):
     compensation_type = ''.join(compensation_type)        # coerce a list to string
     
     if compensation_type is None:
@@ -379,9 +676,11 @@ def close_modal(n_clicks):
 
 # ------------- callback - save_datastore ----------------------
 # triggered by landing modal changing
+# stores only references ({'id', 'version'}) to the shared datasets, not copies of them
 @app.callback(
-    ServersideOutput("jobs-data", "data"), 
-    ServersideOutput("names-data",'data'),
+    Output("jobs-data", "data"), 
+    Output("names-data",'data'),
+    Output('job-wages', 'data'),
     Input('landing-modal', 'is_open'),
     State('jobs-data', 'data'),
     State('names-data', 'data'),
@@ -390,69 +689,129 @@ def close_modal(n_clicks):
 def save_datastore(ts, jobs_data, names_data):
     # names_data can be filtered by year? and earnings?
     if (jobs_data is None) and (names_data is None):
-        return df_jobs, df_names
+        wait_for_data()
+        return datasets.ref('jobs'), datasets.ref('names'), datasets.derived(datasets.ref('jobs'), 'wages')
     else:
         raise PreventUpdate
     
 # ------------- callback - search names in data frame ----------------
+# searches the name index (unique names, built at startup) instead of scanning every row of df_names
+# search as you type: every keystroke submits a search job (cancelling the previous one), and a typed query waits
+# SEARCH_DEBOUNCE on a timer before it enters the job pool, so only the last keystroke of a burst searches
+# a query that contains the previous one only re-checks the previous matches; the match list (at most MAX_SEARCH_MATCHES)
+# stays on the server with the job's result, 'search-results' only holds {'job_id', 'query', 'n_matches', 'truncated'}
+def job_progress(status, label):
+    # shown in place of the results while a job is queued/running
+    if status is None or status['status'] == 'queued':
+        return html.Div(children = [html.Label(label + ' (queued)')])
+    return html.Div(children = [html.Label(label + ' ' + str(int(100*status['progress'])) + '%' + (': ' + status['message'] if status['message'] else ''))])
+
 @app.callback(
-    Output(ids.NAME_SEARCH_RESULTS_CONTAINER, 'children'),
+    Output('name-search-status', 'children'),
+    Output('search-results', 'data'),
+    Output(ids.NAME_SEARCH_RESULTS_TABLE, 'page_current'),
+    Output('search-job', 'data'),
+    Output('search-job-interval', 'disabled'),
     Input(ids.NAME_SEARCH_BUTTON, 'n_clicks'),
-    State(ids.NAME_SEARCH_INPUT, "value"),
-    State('names-data','data'),
+    Input(ids.NAME_SEARCH_INPUT, "value"),
+    Input('search-job-interval', 'n_intervals'),
+    State('search-job', 'data'),
+    State('search-results', 'data'),
     prevent_initial_call=True,
-    memoize = True,
-    blocking = True,
 )
-def search_names(n_clicks, search_name, dff_names):
-    print('entered search_names:')
-    print(search_name)
-    t0=time.time()
-    # handle if names is empty
-    if (search_name is None) or (dff_names is None):
-        raise PreventUpdate
-    # handle if no matches (maybe no need)
+def search_names(n_clicks, search_name, n_intervals, job_id, previous):
+    trigger_id = ctx.triggered[0]["prop_id"].split(".")[0]
 
-    # display unique matches
-    df_names_match = dff_names[dff_names.loc[:,DataSchema.NAME].str.contains(search_name.casefold().strip(), regex=False)]
-    print('pandas str contains:')
-    print(time.time() - t0)
+    if trigger_id != 'search-job-interval':
+        # handle if names is empty
+        if (search_name is None) or (normalize_name(search_name) == ''):
+            raise PreventUpdate
+        typing = trigger_id == ids.NAME_SEARCH_INPUT
+        if typing and (len(normalize_name(search_name)) < MIN_TYPEAHEAD_LENGTH):
+            raise PreventUpdate
+        job_id = jobs.submit(search_names_job, search_name, previous, cancel = job_id, delay = SEARCH_DEBOUNCE if typing else 0)
+        return job_progress(None, 'Searching...'), no_update, no_update, job_id, False
+
+    # poll
+    status = jobs.status(job_id)
+    if status is None:
+        return no_update, no_update, no_update, None, True
+    if status['status'] in ('queued', 'running'):
+        return job_progress(status, 'Searching...'), no_update, no_update, no_update, False
+    if status['status'] == 'done':
+        matches = jobs.result(job_id)
+        n_matches = len(matches['ids'])
+        label = 'No matching names found.' if n_matches == 0 else (('More than ' if matches['truncated'] else '') + str(n_matches) + ' matching names, select a name to add to the plots')
+        return label, {'job_id': job_id, 'query': matches['query'], 'n_matches': n_matches, 'truncated': matches['truncated']}, 0, None, True
+    if status['status'] == 'error' and status['error'] != 'PreventUpdate':
+        return 'Search failed, please try again.', no_update, no_update, None, True
+    return no_update, no_update, no_update, None, True
+
+def search_names_job(job, search_name, previous):
+    job.progress(0, 'waiting for data' if not data_ready.is_set() else '')     # raises if a newer keystroke cancelled this search
+    wait_for_data()
+    job.progress(0.1)
+
+    # refine: every name containing the new query also contains the previous one (unless the previous list was cut off)
+    key = normalize_name(search_name)
+    previous_matches = None
+    if (previous is not None) and (not previous.get('truncated')) and (normalize_name(previous['query']) in key):
+        try:
+            previous_matches = jobs.result(previous['job_id'])
+        except (OSError, EOFError):
+            pass        # pruned, search from scratch
+
+    with metrics.section('search'):
+        if previous_matches is not None:
+            return search_matches(search_name, previous_matches['exact'])
+        # concurrent identical searches (any session) share one computation
+        return flights.do(('search', key), lambda: search_matches(search_name))
+
+def search_matches(search_name, candidates = None):
+    # names containing the query (best first, at most MAX_SEARCH_MATCHES), plus the closest misspellings when there are only a few
+    # every match is ranked before the list is cut, so a broad query still keeps its best (prefix) matches
+    exact = name_index.search(search_name, candidates = candidates)
+    truncated = len(exact) > MAX_SEARCH_MATCHES
+    exact = name_index.sort_matches(search_name, exact, limit = MAX_SEARCH_MATCHES)
+    name_ids = exact
+    if len(exact) < FUZZY_FILL:
+        exact_set = set(exact.tolist())
+        fuzzy = [name_id for name_id, score in name_index.rank(search_name, k = FUZZY_FILL) if name_id not in exact_set]
+        name_ids = np.concatenate([exact, np.asarray(fuzzy, dtype=np.int64)])
+    return {'query': search_name, 'exact': exact, 'ids': name_ids, 'truncated': truncated}
+
+def cached_matches(results):
+    if results['job_id'] is not None:
+        try:
+            return jobs.result(results['job_id'])
+        except (OSError, EOFError):
+            pass        # job results are pruned after a while
+    return flights.do(('search', normalize_name(results['query'])), lambda: search_matches(results['query']))
+
+# ------------- callback - page through the search results ----------------
+# one page of rows per request, gathered from the precomputed employee directory, sorted over the whole match list
+@app.callback(
+    Output(ids.NAME_SEARCH_RESULTS_TABLE, 'data'),
+    Output(ids.NAME_SEARCH_RESULTS_TABLE, 'page_count'),
+    Input('search-results', 'data'),
+    Input(ids.NAME_SEARCH_RESULTS_TABLE, 'page_current'),
+    Input(ids.NAME_SEARCH_RESULTS_TABLE, 'page_size'),
+    Input(ids.NAME_SEARCH_RESULTS_TABLE, 'sort_by'),
+    prevent_initial_call=True,
+)
+def page_search_results(results, page_current, page_size, sort_by):
+    if results is None:
+        raise PreventUpdate
+    wait_for_data()
+    name_ids = cached_matches(results)['ids']
 
-    t0=time.time()
-    unique_names_match = list(set(df_names_match[DataSchema.NAME]))
+    if sort_by:
+        name_ids = employee_directory.sort(name_ids, sort_by[0]['column_id'], descending = sort_by[0]['direction'] == 'desc')
 
-    # handle if too many matches (todo: leave message)
-    if len(unique_names_match) > 200:
-        too_many_matches = html.Div(
-            children = [
-                html.Label('Found too many matching results. Please enter a more specific name.'),
-            ]
-        )
-        return too_many_matches
-
-    # build df where each row is a unique employee w/ an employee name col and a years available col
-    table_data_records_list = []
-    for name in unique_names_match:
-        years_available = df_names_match[DataSchema.YEAR].loc[df_names_match[DataSchema.NAME]==name].to_list()
-        years_available_str = ', '.join([str(x) for x in years_available])
-        table_data_records_list.append({
-            DataSchema.NAME: name, 
-            'Years Available': years_available_str
-        })
-    print('rest of the script:')
-    print(time.time() - t0)   
-
-    name_search_results_container_updated = html.Div(
-        children = [
-            html.Label('Select a name to add to the plots'),
-            dash_table.DataTable(
-                data = table_data_records_list, 
-                columns = [{"name": DataSchema.NAME, "id": DataSchema.NAME}, {"name": 'Years Available', "id": 'Years Available'}],
-                id = ids.NAME_SEARCH_RESULTS_TABLE
-            )
-        ]
-    )
-    return name_search_results_container_updated
+    page_current = page_current or 0
+    page = name_ids[page_current*page_size:(page_current + 1)*page_size]
+    page_count = max(1, -(-len(name_ids)//page_size))
+    return employee_directory.records(page), page_count
 
 # ------------- callback - add selected name from table to the dropdown ----------------
 @app.callback(
@@ -476,38 +835,22 @@ def add_name_to_dropdown(n_clicks, active_cell, data, value, options):
     return value, options
 
 # ------------- callback - update initial wages ----------------
-@app.callback(
+# runs in the browser (assets/initial_wage.js) from the small job wages table in 'job-wages'
+app.clientside_callback(
+    ClientsideFunction(namespace='wages', function_name='update_initial_wage_input'),
     Output(ids.INITIAL_WAGE_DROPDOWN, "value"),
     Output(ids.INITIAL_WAGE_INPUT, "value"),
     Input(ids.INITIAL_WAGE_DROPDOWN, "value"),
     Input(ids.INITIAL_WAGE_INPUT, "value"),
     Input(ids.YEAR_RANGE_SLIDER, 'value'),
-    State('jobs-data','data'),
+    State('job-wages', 'data'),
+    State('select-compensation-dropdown', 'value'),
     prevent_initial_call=True
 )
-def update_initial_wage_input(dropdown_value, input_value, years, df_jobs):
-    min_year = years[0]
-
-    trigger_id = ctx.triggered[0]["prop_id"].split(".")[0]
-
-    if (trigger_id == ids.INITIAL_WAGE_DROPDOWN) or (trigger_id == ids.YEAR_RANGE_SLIDER):
-        # if callback was triggered by user selecting from the dropdown menu, find the selected initial wage to display in the input field
-        logical_array = (df_jobs[DataSchema.YEAR] == min_year) & (df_jobs[DataSchema.NAME] == dropdown_value)  # need to handle if more than 1 match
-        if sum(logical_array) == 1: 
-            input_value = df_jobs.loc[logical_array,DataSchema.PAY].iloc[0]  
-        else:
-            input_value = "" # default value if no string matches
-
-    elif trigger_id == ids.INITIAL_WAGE_INPUT:
-        # if callback was triggered by user editing the input field, set dropdown value to empty
-        dropdown_value = ""
-        input_value = input_value
-
-    return dropdown_value, input_value
 
 #------------- callback - filtered-names-data -----------------
 # triggered (1) when name is added/dropped or (2) year range slider is moved (3) initial creation of data store
-# filters by names detected in dropdown menu and year range
+# gathers the rows of the selected names from the dense pay matrix (all years, selected compensation)
 @app.callback(
     ServersideOutput('filtered-names-data', 'data'),
     Input(ids.NAME_ADDED_DROPDOWN, "value"),
@@ -515,24 +858,21 @@ def update_initial_wage_input(dropdown_value, input_value, years, df_jobs):
     Input('compensation-accordion-item','title'),
     prevent_initial_call = True
 )
-def filter_names_data(names, df_names, title):
-    if (names is None) or (names == []):
+def filter_names_data(names, names_ref, title):
+    if (names is None) or (names == []) or (names_ref is None):
         raise PreventUpdate
 
-    # IMPORTANT when dealing with categories (cat.remove_unused_categories)
-    print('in filter_names_data:')
-    t0 = time.time()
-    logical_array = (df_names[DataSchema.NAME].isin(names))
-    df_names_filtered = df_names.loc[logical_array, [DataSchema.PAY, DataSchema.YEAR]]
-    df_names_filtered = df_names_filtered.merge(df_names.loc[(df_names[DataSchema.NAME].isin(names)),DataSchema.NAME].cat.remove_unused_categories(),left_index=True, right_index=True)
-    print(time.time() - t0)
-
+    compensation = DataSchema.PAY
+    with metrics.section('pandas'):
+        # sorted, so the same selection in any order coalesces (and every follower gets the leader's row order)
+        names = sorted(names)
+        names_block = flights.do(('names', names_ref['version'], compensation, tuple(names)), lambda: datasets.derived(names_ref, 'matrix').select(names, compensation).tagged('names'))
 
-    return df_names_filtered
+    return names_block
 
 #------------- callback - filtered-jobs-data -----------------
 # triggered (1) when name is added/dropped or (2) year range slider is moved
-# filters by jobs detected in dropdown menu and year range
+# gathers the rows of the selected jobs from the dense pay matrix (all years, selected compensation)
 # prevent_initial_call is false because we want this to be updated ast startup
 @app.callback(
     ServersideOutput('filtered-jobs-data', 'data'),
@@ -541,26 +881,19 @@ def filter_names_data(names, df_names, title):
     Input('compensation-accordion-item','title'),
     prevent_initial_call = True
 )
-def filter_jobs_data(jobs, df_jobs, title):
-    if jobs is None:
+def filter_jobs_data(jobs, jobs_ref, title):
+    if (jobs is None) or (jobs_ref is None):
         raise PreventUpdate
 
-    # IMPORTANT for mem usage when dealing with categories (cat.remove_unused_categories)
-    print('in filter_jobs_data:')
-    t0 = time.time()
-    logical_array = (df_jobs[DataSchema.NAME].isin(jobs)) 
-    df_jobs_filtered = df_jobs.loc[logical_array, [DataSchema.PAY, DataSchema.YEAR]]
-    df_jobs_filtered = df_jobs_filtered.merge(df_jobs.loc[logical_array, DataSchema.NAME].cat.remove_unused_categories(),left_index=True, right_index=True)
-    print(time.time() - t0)
-    print('size of df_jobs_filtered:')
-    print(df_jobs_filtered.info(memory_usage = 'deep'))
-    
-    return df_jobs_filtered
+    with metrics.section('pandas'):
+        jobs_block = datasets.derived(jobs_ref, 'matrix').select(jobs, DataSchema.PAY).tagged('jobs')
+
+    return jobs_block
 
 #------------- callback - filtered-combined-data -----------------
 #
-# combines filtered-jobs-data and filtered-names-data
-# further processing by handling duplicates, 
+# combines filtered-jobs-data and filtered-names-data and slices the year range
+# (duplicate name/year rows were already added together at ingest, see ingest.aggregate_duplicates)
 @app.callback(
     ServersideOutput('filtered-combined-data', 'data'),
     Input('filtered-jobs-data','data'),
@@ -568,242 +901,163 @@ def filter_jobs_data(jobs, df_jobs, title):
     Input(ids.YEAR_RANGE_SLIDER, 'value'),
     prevent_initial_call = True
 )
-def filter_combined_data(df_jobs_filtered, df_names_filtered, years):
+def filter_combined_data(jobs_block, names_block, years):
     min_year = years[0]
     max_year = years[1]
 
-    # combine
-    df_combined = pd.concat([df_jobs_filtered, df_names_filtered]).astype({DataSchema.NAME: "category"})
-
-    # filter out unused years
-    logical_array = (df_combined[DataSchema.YEAR] >= min_year) & (df_combined[DataSchema.YEAR] <= max_year)
-    df_combined_filtered = df_combined.loc[logical_array, [DataSchema.PAY, DataSchema.YEAR]]
-    df_combined_filtered = df_combined_filtered.merge(df_combined.loc[logical_array, DataSchema.NAME].cat.remove_unused_categories(),left_index=True, right_index=True)
-    
-    # handle duplicates (same year and name)
-    # TODO: handle "duplicates" with common names
-    df_duplicates = df_combined_filtered[df_combined_filtered[[DataSchema.YEAR, DataSchema.NAME]].duplicated(keep=False)]                 # grab all duplicates (names and year)
-    if len(df_duplicates) > 0:
-        df_duplicates = df_duplicates.groupby([DataSchema.YEAR, DataSchema.NAME])[DataSchema.PAY].sum().reset_index()       # add duplicates together
-    df_combined_filtered = df_combined_filtered[~df_combined_filtered[[DataSchema.YEAR, DataSchema.NAME]].duplicated(keep=False)]                  # delete duplciates from dff_combined
-    df_combined_filtered = pd.concat([df_combined_filtered, df_duplicates])                                                               # concatenate together
-
-    return df_combined_filtered
-
-# ----------------- function for resetting figures -----
-def reset_fig_lollipop():
-    fig_lollipop = go.Figure()
-
-    # templates
-    lollipop_template = go.layout.Template()
-    lollipop_template.layout = go.Layout(
-            paper_bgcolor=colors.PLOT_BACKGROUND_COLOR,
-            plot_bgcolor=colors.PLOT_BACKGROUND_COLOR,
-            showlegend=False,
-            title_font=dict(family="Arial", size=24),
-            yaxis=dict(linewidth=1, linecolor = "black", 
-                showgrid=True,  gridcolor = colors.GRID_LINES_COLOR, gridwidth=1,
-                automargin = True,
-                showline = False,
-                fixedrange = True
-            ),
-            xaxis=dict(zeroline = False, rangemode = "tozero", 
-                title = dict(text = "Compensation (USD)"),
-                showgrid=True,  gridcolor = colors.GRID_LINES_COLOR, gridwidth=1,
-                showline = True, linewidth=1, linecolor = "black",
-                fixedrange = True
-                )
-        )
-    fig_lollipop.update_layout(template=lollipop_template)
-    return fig_lollipop
-
-def reset_figures():
-    print('inside reset_figures:')
-    fig_real_wages = go.Figure()
-    fig_projected_wages = go.Figure()
-
-    line_template = go.layout.Template()
-    line_template.layout = go.Layout(
-            paper_bgcolor=colors.PLOT_BACKGROUND_COLOR,
-            plot_bgcolor=colors.PLOT_BACKGROUND_COLOR,
-            showlegend=False,
-            title_font=dict(family="Arial", size=18),
-            yaxis=dict(linewidth=1, linecolor = "black", 
-                showgrid=True,  gridcolor = colors.GRID_LINES_COLOR, gridwidth=1,
-                title = dict(text = "Compensation (USD)"),
-                automargin = True,
-                showline = True,
-                fixedrange = True),
-            xaxis=dict(zeroline = False,
-                showgrid=True,  gridcolor = colors.GRID_LINES_COLOR, gridwidth=1,
-                showline = True, linewidth=1, linecolor = "black",
-                dtick = 1,
-                fixedrange = True
-                ),
-            hovermode="x"
-        )
-    fig_real_wages.update_layout(template=line_template)
-    fig_projected_wages.update_layout(template=line_template)
-
-    # create empty dataframes to track names of traces
-    df_traces_in_real_wages = pd.DataFrame({DataSchema.NAME: [], "Index": []}).astype({DataSchema.NAME: "category", "Index": int})
-    df_traces_in_projected_wages = pd.DataFrame({DataSchema.NAME: [], "Index": []}).astype({DataSchema.NAME: "category", "Index": int})
+    combined_block = PayBlock.concat([jobs_block, names_block])
+    if combined_block is None:
+        raise PreventUpdate
 
-    return fig_projected_wages, fig_real_wages, df_traces_in_projected_wages, df_traces_in_real_wages
+    return combined_block.year_range(min_year, max_year)
 
 # --------------- function for updating figures --------
 # triggered when (1) filtered-jobs-data/filtered-names-data stores are updated 
 #
-# this callback updates figs only by adding/"removing" traces ("not technically removing, just deleting variables")
-# also maintains a data frame ledger that tracks what names/jobs currently have traces in the figs
+# the real/projected wages figures are not sent back in full: a server-side FigureModel per figure (one per session, in the
+# serverside cache) tracks which name is in which trace, and only the added/changed/removed traces are sent to the
+# 'real-wages-delta'/'projected-wages-delta' stores, which assets/figure_delta.js applies to the figures in the browser
+#
+# the work runs in the job pool: a new trigger submits a job (cancelling the previous one if it is still running) and
+# poll_figures follows it with figures-job-interval; a view already in the result cache only needs the (cheap) model
+# update, so that job runs inline and poll_figures applies it right away, without an interval tick; the models are only replaced when a job's result is applied, so a
+# cancelled job never leaves the session's models out of step with the figures in the browser
+# a job can still be built on a model whose previous delta hasn't reached the browser yet (a trigger that arrived
+# before poll_figures applied the previous job): the browser then rejects the delta (its base version doesn't match,
+# see figure_model.py) and sets a *-resync store, which rebuilds both figures like the refresh button
 @app.callback(
-        ServersideOutput('traces-in-real-wages', 'data'),
-        ServersideOutput('traces-in-projected-wages', 'data'),
-        Output(ids.PROJECTED_WAGES_LINE_PLOT, "figure"),
-        Output(ids.REAL_WAGES_LINE_PLOT, "figure"),
-        Output(ids.LOLLIPOP_CHART, "figure"),
-        Input(ids.INITIAL_WAGE_INPUT, "value"),
+        Output('figures-job', 'data'),
         Input('filtered-combined-data', 'data'),
         Input('refresh-figures-button','n_clicks'),
+        Input('real-wages-resync', 'data'),
+        Input('projected-wages-resync', 'data'),
         State(ids.YEAR_RANGE_SLIDER, 'value'),
         State('traces-in-real-wages','data'),
         State('traces-in-projected-wages','data'),
-        State(ids.PROJECTED_WAGES_LINE_PLOT, "figure"),
-        State(ids.REAL_WAGES_LINE_PLOT, "figure"),
+        State('figures-job', 'data'),
         prevent_initial_call = True,
-        blocking = True
 )
-def update_figures(initial_wage, df_combined_filtered, n_clicks, years, df_traces_in_real_wages, df_traces_in_projected_wages, fig_projected_wages, fig_real_wages):
+def update_figures(combined_block, n_clicks, real_wages_resync, projected_wages_resync, years, real_wages_model, projected_wages_model, job_id):
+    if combined_block is None:
+        raise PreventUpdate
+    refresh = ctx.triggered[0]["prop_id"].split(".")[0] in ('refresh-figures-button', 'real-wages-resync', 'projected-wages-resync')
+    args = (combined_block, years, real_wages_model, projected_wages_model, refresh)
+    if result_cache.contains(figure_data_key(combined_block, years)):
+        return jobs.run_inline(update_figures_job, *args, cancel = job_id)
+    return jobs.submit(update_figures_job, *args, cancel = job_id)
+
+# polls the figures job: only the job id and the interval come in, so a tick doesn't load the blocks or models from the
+# serverside cache; the new models and deltas are read from the job's result once it is done
+@app.callback(
+        ServersideOutput('traces-in-real-wages', 'data'),
+        ServersideOutput('traces-in-projected-wages', 'data'),
+        Output('projected-wages-delta', 'data'),
+        Output('real-wages-delta', 'data'),
+        Output(ids.LOLLIPOP_CHART, "figure"),
+        Output('figures-job-interval', 'disabled'),
+        Input('figures-job', 'data'),
+        Input('figures-job-interval', 'n_intervals'),
+        prevent_initial_call = True,
+)
+def poll_figures(job_id, n_intervals):
+    if job_id is None:
+        raise PreventUpdate
+    status = jobs.status(job_id)
+    if (status is not None) and (status['status'] in ('queued', 'running')):
+        if ctx.triggered[0]["prop_id"].split(".")[0] == 'figures-job-interval':
+            raise PreventUpdate         # already polling
+        return no_update, no_update, no_update, no_update, no_update, False
+    if (status is None) or (status['status'] != 'done'):
+        return no_update, no_update, no_update, no_update, no_update, True
+    return jobs.result(job_id) + (True,)
+
+def update_figures_job(job, combined_block, years, real_wages_model, projected_wages_model, refresh):
     min_year = years[0]
     max_year = years[1]
-    trigger_id = ctx.triggered[0]["prop_id"].split(".")[0]
 
-    # the innermost if statement should evaluate as true when user moves the year slider or modify input function; if so, resets plots and "ledgers"
-    if fig_real_wages is not None:
-        if fig_real_wages['layout']['xaxis']['range'] is not None:
-            current_fig_min_year = -int(-fig_real_wages['layout']['xaxis']['range'][0]//1)       # this rounds up b/c axes min is less than the smallest year
-            current_fig_max_year = int(fig_real_wages['layout']['xaxis']['range'][1]//1)          # this rounds down
+    # start over (new layout, no traces) on the very first call, when the year range moved, or on refresh
+    if (real_wages_model is None) or (real_wages_model.years != [min_year, max_year]) or refresh:
+        real_wages_model = FigureModel([min_year, max_year], figures.line_layout())
+    if (projected_wages_model is None) or (projected_wages_model.years != [min_year, max_year]) or refresh:
+        projected_wages_model = FigureModel([min_year, max_year], figures.line_layout(), trace = factor_trace)
 
-            if (current_fig_min_year != min_year) or (current_fig_max_year != max_year) or (trigger_id == ids.INITIAL_WAGE_INPUT):
-                fig_projected_wages, fig_real_wages, df_traces_in_projected_wages, df_traces_in_real_wages = reset_figures()
-                fig_lollipop = reset_fig_lollipop()
-            else:
-                # do not reset real/projected wages figs - build it from dictionaries from their existing state
-                fig_real_wages = go.Figure(fig_real_wages)
-                fig_projected_wages = go.Figure(fig_projected_wages)
-                fig_lollipop = reset_fig_lollipop()
-
-
-    # the very first invocation of this callback is from updating 'filtered-jobs-data', triggered by the modal closing
-    if (df_traces_in_real_wages is None) or (df_traces_in_projected_wages is None) or (trigger_id == 'refresh-figures-button'):
-        reset_flag = False
-        fig_projected_wages, fig_real_wages, df_traces_in_projected_wages, df_traces_in_real_wages = reset_figures()
-        fig_lollipop = reset_fig_lollipop()
-
-    # for real wages:
-    # get names for real_wages figure
-    names_wanted_in_real_wages = set(df_combined_filtered.loc[:,DataSchema.NAME])
-    names_already_in_real_wages = set(df_traces_in_real_wages.loc[:, DataSchema.NAME])
-
-    # names already in real wages but not in wanted: delete traces
-    names_2delete_real_wages = list(names_already_in_real_wages.difference(names_wanted_in_real_wages))
-    logical_array = df_traces_in_real_wages[DataSchema.NAME].isin(names_2delete_real_wages)
-    indexes_2delete_real_wages = df_traces_in_real_wages.loc[logical_array, 'Index']
-    for i in indexes_2delete_real_wages:
-        fig_real_wages.data[int(i)]['x'] = []                        # awkward, but can't delete from tuple; can hide/modify inside objects
-        fig_real_wages.data[int(i)]['y'] = []  
-    
-    df_traces_in_real_wages = df_traces_in_real_wages.loc[~logical_array, :]                        # remove deleted traces from the df "ledger"
-
-    # names in wanted but not yet in real wages: add traces
-    names_2add_real_wages = list(names_wanted_in_real_wages.difference(names_already_in_real_wages))
-    fig_real_wage_indices = list()
-    for name in names_2add_real_wages:
-        logical_array = df_combined_filtered.loc[:,DataSchema.NAME] == name
-        x_var = df_combined_filtered.loc[logical_array,DataSchema.YEAR]
-        y_var = df_combined_filtered.loc[logical_array,DataSchema.PAY]
-
-        fig_real_wages.add_trace(go.Scatter(x = x_var, y = y_var, name = name, hovertemplate = '$%{y}'))
-        fig_real_wage_indices.append(len(fig_real_wages.data) - 1)     
-
-    df_traces_in_real_wages = pd.concat([df_traces_in_real_wages, pd.DataFrame({DataSchema.NAME: names_2add_real_wages, 'Index': fig_real_wage_indices})]).astype({DataSchema.NAME: "category", "Index": int})     # update ledger
-
-    # for projected wages/lollipop:
-    # additional filter for names/jobs that do not span the years
-    names_with_min = df_combined_filtered.loc[df_combined_filtered[DataSchema.YEAR] == min_year, DataSchema.NAME]
-    names_with_max = df_combined_filtered.loc[df_combined_filtered[DataSchema.YEAR] == max_year, DataSchema.NAME]
-    names_wanted_in_projected_wages = set(names_with_max) & set(names_with_min)
-    names_already_in_projected_wages = set(df_traces_in_projected_wages.loc[:, DataSchema.NAME])
-
-    # names already in real wages but not in wanted: delete traces
-    names_2delete_projected_wages = list(names_already_in_projected_wages.difference(names_wanted_in_projected_wages))
-    logical_array = df_traces_in_projected_wages[DataSchema.NAME].isin(names_2delete_projected_wages)
-    indexes_2delete_projected_wages = df_traces_in_projected_wages.loc[logical_array, 'Index']
-    for i in indexes_2delete_projected_wages:
-        fig_projected_wages.data[int(i)]['x'] = []                        # awkward, but can't delete from tuple; can hide/modify inside objects
-        fig_projected_wages.data[int(i)]['y'] = []  
-    df_traces_in_projected_wages = df_traces_in_projected_wages.loc[~logical_array, :]                        # remove deleted traces from the df "ledger"
-
-    # names in wanted but not yet in real wages: add traces
-    names_2add_projected_wages = list(names_wanted_in_projected_wages.difference(names_already_in_projected_wages))
-    fig_projected_wage_indices = list()
-    for name in names_2add_projected_wages:
-        logical_array = df_combined_filtered.loc[:,DataSchema.NAME] == name
-        
-        pay = df_combined_filtered.loc[logical_array,DataSchema.PAY].to_numpy()
-        priorpay = df_combined_filtered.loc[logical_array,DataSchema.PAY].shift(1).to_numpy()
-        priorpay[0] = pay[0]
-        adjustment = (pay - priorpay)/priorpay + 1
-        cumadjustment = pd.Series(adjustment).cumprod() 
-
-        y_var = cumadjustment*initial_wage
-        x_var = df_combined_filtered.loc[logical_array,DataSchema.YEAR]
-        
-        fig_projected_wages.add_trace(go.Scatter(x = x_var, y = y_var, hovertemplate = '$%{y}', name=name))
-        fig_projected_wage_indices.append(len(fig_projected_wages.data) - 1)     
+    # series and lollipop come from the process-wide cache when another session already asked for the same view
+    data = cached_figure_data(combined_block, years)
+    job.progress(0.8)
 
-    df_traces_in_projected_wages = pd.concat([df_traces_in_projected_wages, pd.DataFrame({DataSchema.NAME: names_2add_projected_wages, 'Index': fig_projected_wage_indices})]).astype({DataSchema.NAME: "category", "Index": int})     # update ledger
-    
-    # create df_lollipop (pivot_wider the first and last years)
-    # df lollipop needs to be reset every time because of sorting by largest to smallest
-    df_lollipop = df_combined_filtered[df_combined_filtered[DataSchema.NAME].isin(names_wanted_in_projected_wages)]         # df lollipop uses the same wanted names as projected wages   
-    if len(df_lollipop) > 0:
-        df_lollipop = df_lollipop.pivot(index=DataSchema.NAME, columns=DataSchema.YEAR, values=DataSchema.PAY).reset_index()
-        # sort by ascending wages
-        df_lollipop = df_lollipop.sort_values(by=[max_year, min_year], ascending=True)
-
-        lollipop_x_start = df_lollipop[min_year].tolist()
-        lollipop_x_end = df_lollipop[max_year].tolist()
-        lollipop_y = df_lollipop[DataSchema.NAME].tolist()
-
-        for i in range(0, len(lollipop_x_start)):
-            fig_lollipop.add_trace(go.Scatter(
-                        x = [lollipop_x_start[i], lollipop_x_end[i]],
-                        y = [lollipop_y[i],lollipop_y[i]],
-                        line=dict(color=colors.LOLLIPOP_LINE_COLOR, width=3)))
-
-
-        fig_lollipop.add_trace(go.Scatter(
-                        name=str(min_year) + " Compensation",
-                        x=lollipop_x_start,
-                        y=lollipop_y,
-                        mode = "markers",
-                        marker_symbol = "circle",
-                        marker_size = 15,
-                        marker_color=colors.START_MARKER_COLOR,
-                    )
-        )
+    with metrics.section('figures'):
+        # for real wages: every name with data in the year range
+        real_wages_delta = real_wages_model.update(data['real_wages'])
 
-        fig_lollipop.add_trace(go.Scatter(
-                        name=str(max_year) + " Compensation",
-                        x=lollipop_x_end,
-                        y=lollipop_y,
-                        mode = "markers",
-                        marker_size = 15,
-                        marker_color=colors.END_MARKER_COLOR)
-        )
+        # for projected wages: only names/jobs that span the years
+        # only the cumulative adjustment factors are sent; the browser multiplies them by the initial wage, so changing
+        # the initial wage never comes back to the server
+        projected_wages_delta = projected_wages_model.update(data['adjustment_factors'])
+
+    # lollipop: rebuilt every time because of sorting by largest to smallest (same names as projected wages)
+    fig_lollipop = data['lollipop']
 
-    return df_traces_in_real_wages, df_traces_in_projected_wages, fig_projected_wages, fig_real_wages, fig_lollipop
+    return real_wages_model, projected_wages_model, projected_wages_delta, real_wages_delta, fig_lollipop
+
+# ------------- callback - population bands ----------------
+# UC-wide percentile traces for the real wages figure, sliced from the bands computed at load (never recomputed per request)
+# kept out of the figure model: assets/figure_delta.js draws them behind the model's traces
+@app.callback(
+    Output('real-wages-bands', 'data'),
+    Input('population-bands-checklist', 'value'),
+    Input(ids.YEAR_RANGE_SLIDER, 'value'),
+    Input('select-compensation-dropdown', 'value'),
+    prevent_initial_call = True
+)
+def update_population_bands(show, years, compensation):
+    if 'bands' not in (show or []):
+        return []
+    wait_for_data()
+    compensation = ''.join(compensation)        # coerce a list to string
+    return figures.band_traces(datasets.derived(datasets.ref('names'), 'bands'), compensation, years[0], years[1])
+
+# ------------- callback - raise inequality ----------------
+# raises of every employee spanning the year range, summarized once per (compensation, year range) by raises.RaiseEngine
+# doesn't depend on the selected names, only on the year range and compensation
+# triggered by names-data like the other data-dependent callbacks, so a page load never waits on the data load
+@app.callback(
+    Output(ids.RAISE_CHART, 'figure'),
+    Output(ids.LARGEST_RAISES_TABLE, 'data'),
+    Input('names-data', 'data'),
+    Input(ids.YEAR_RANGE_SLIDER, 'value'),
+    Input('select-compensation-dropdown', 'value'),
+    prevent_initial_call = True
+)
+def update_raises(names_data, years, compensation):
+    if names_data is None:
+        raise PreventUpdate
+    compensation = ''.join(compensation)        # coerce a list to string
+    with metrics.section('pandas'):
+        summary = datasets.derived(names_data, 'raises').summary(compensation, years[0], years[1])
+    with metrics.section('figures'):
+        fig_raises = figures.build_raise_chart(summary)
+    return fig_raises, ([] if summary is None else summary['top'])
+
+# ------------- clientside callbacks - apply figure deltas ----------------
+app.clientside_callback(
+    ClientsideFunction(namespace='figures', function_name='apply_delta'),
+    Output(ids.REAL_WAGES_LINE_PLOT, "figure"),
+    Output('real-wages-resync', 'data'),
+    Input('real-wages-delta', 'data'),
+    Input('real-wages-bands', 'data'),
+    State(ids.REAL_WAGES_LINE_PLOT, "figure"),
+    prevent_initial_call = True
+)
+
+app.clientside_callback(
+    ClientsideFunction(namespace='figures', function_name='apply_scaled_delta'),
+    Output(ids.PROJECTED_WAGES_LINE_PLOT, "figure"),
+    Output('projected-wages-resync', 'data'),
+    Input('projected-wages-delta', 'data'),
+    Input(ids.INITIAL_WAGE_INPUT, "value"),
+    State(ids.PROJECTED_WAGES_LINE_PLOT, "figure"),
+    prevent_initial_call = True
+)
 
 
 
@@ -0,0 +1,82 @@
+// applies the trace deltas computed by update_figures (see figure_model.py) to the figure already in the browser
+// bands: UC-wide percentile traces (meta 'band', see figures.band_traces) drawn first; delta slots index the other traces
+// the figure's layout.datarevision is the version of the last delta applied; a delta built on another version can't be
+// applied (its slots refer to a model the browser doesn't have): null, the caller asks the server for a full refresh
+function applyDelta(delta, figure, bands) {
+    let fig;
+    if (delta.reset) {
+        fig = {data: [], layout: delta.layout};
+    } else if (!figure || !figure.layout || figure.layout.datarevision !== delta.base) {
+        return null;
+    } else {
+        fig = {data: slotTraces(figure), layout: figure.layout};
+    }
+    fig.layout = Object.assign({}, fig.layout, {datarevision: delta.version});
+    delta.clear.forEach(function(slot) {
+        // awkward, but keeps the other trace indices valid
+        fig.data[slot] = Object.assign({}, fig.data[slot], {x: [], y: [], customdata: []});
+    });
+    delta.set.forEach(function(item) {
+        fig.data[item[0]] = item[1];
+    });
+    fig.data = (bands || []).concat(fig.data);
+    return fig;
+}
+
+function slotTraces(figure) {
+    return figure.data.filter(function(trace) { return trace.meta !== 'band'; });
+}
+
+function triggeredBy(prefix) {
+    const triggered = window.dash_clientside.callback_context.triggered.map(function(t) { return t.prop_id; });
+    return triggered.some(function(prop_id) { return prop_id.startsWith(prefix); });
+}
+
+window.dash_clientside = Object.assign({}, window.dash_clientside, {
+    figures: {
+        // returns [figure, resync]: resync is set (to a timestamp) when the delta didn't fit the figure
+        apply_delta: function(delta, bands, figure) {
+            const no_update = window.dash_clientside.no_update;
+            if (triggeredBy('real-wages-delta')) {
+                if (!delta) {
+                    return [no_update, no_update];
+                }
+                const fig = applyDelta(delta, figure, bands);
+                return fig ? [fig, no_update] : [no_update, Date.now()];
+            }
+            // only the bands changed (toggled, year range or compensation): swap them, keep the slots
+            if (!figure) {
+                return [no_update, no_update];
+            }
+            return [{data: (bands || []).concat(slotTraces(figure)), layout: figure.layout}, no_update];
+        },
+
+        // projected wages traces carry their cumulative adjustment factors in customdata,
+        // so a new initial wage is just y = factor * initial wage for every trace, without going to the server
+        apply_scaled_delta: function(delta, initial_wage, figure) {
+            const no_update = window.dash_clientside.no_update;
+            let fig;
+            if (triggeredBy('projected-wages-delta')) {
+                if (!delta) {
+                    return [no_update, no_update];
+                }
+                fig = applyDelta(delta, figure);
+                if (!fig) {
+                    return [no_update, Date.now()];
+                }
+            } else {
+                if (!figure) {
+                    return [no_update, no_update];
+                }
+                fig = {data: figure.data.slice(), layout: figure.layout};
+            }
+            const wage = parseFloat(initial_wage);
+            fig.data = fig.data.map(function(trace) {
+                const factors = trace.customdata || [];
+                const y = isNaN(wage) ? [] : factors.map(function(factor) { return factor * wage; });
+                return Object.assign({}, trace, {y: y});
+            });
+            return [fig, no_update];
+        }
+    }
+});
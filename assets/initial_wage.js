@@ -0,0 +1,20 @@
+// keeps the initial wage dropdown and input in sync in the browser (no server round trip per typed value)
+// job_wages: {compensation: {job: {year: pay}}}, filled by save_datastore
+window.dash_clientside = Object.assign({}, window.dash_clientside, {
+    wages: {
+        update_initial_wage_input: function(dropdown_value, input_value, years, job_wages, compensation) {
+            const trigger_id = window.dash_clientside.callback_context.triggered[0].prop_id.split('.')[0];
+            const min_year = years[0];
+
+            if ((trigger_id === 'initial-wage-dropdown') || (trigger_id === 'year-range-slider')) {
+                // if callback was triggered by user selecting from the dropdown menu, find the selected initial wage to display in the input field
+                const wages = (job_wages && job_wages[compensation] && job_wages[compensation][dropdown_value]) || {};
+                input_value = (wages[min_year] !== undefined) ? wages[min_year] : "";      // default value if no string matches
+            } else if (trigger_id === 'initial-wage-input') {
+                // if callback was triggered by user editing the input field, set dropdown value to empty
+                dropdown_value = "";
+            }
+            return [dropdown_value, input_value];
+        }
+    }
+});
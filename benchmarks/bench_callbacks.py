@@ -0,0 +1,224 @@
+"""Times the dash callbacks directly (no browser, no http) on synthetic name datasets.
+
+    python benchmarks/bench_callbacks.py --scales 100k 1M 10M
+    python benchmarks/bench_callbacks.py --scales 100k 1M --save-baseline       # record benchmarks/baseline.json
+    python benchmarks/bench_callbacks.py --scales 100k 1M                       # compare against it (exit code 1 on regressions)
+
+for each scale: builds the dataset like load_data() does (ingest, pay matrix, name index), then times the work of
+search_names, filter_names_data, filter_jobs_data, filter_combined_data, update_figures and update_raises (cold = empty
+result/summary cache, warm = same view again). search_names/update_figures run their job function inline (see jobs.py).
+timings are the median/min of --repeat runs, peak memory is measured in a separate run with tracemalloc
+"""
+import argparse
+import json
+import os
+import statistics
+import sys
+import time
+import tracemalloc
+
+REPO_PATH = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, REPO_PATH)
+
+# the app must not load the real names dataset while importing, the benchmark installs its own
+os.environ['UC_WAGES_STARTUP_MODE'] = 'external'
+
+from dash._callback_context import context_value
+from dash._utils import AttributeDict
+import app
+from schema import DataSchema
+from data_store import datasets
+from ingest import aggregate_duplicates
+from name_index import NameIndex
+from directory import EmployeeDirectory
+from pay_matrix import PayMatrix
+from raises import RaiseEngine
+from result_cache import ResultCache
+from synthetic import synthetic_names
+
+SCALES = {'100k': 100_000, '1M': 1_000_000, '10M': 10_000_000}
+BASELINE_PATH = os.path.join(REPO_PATH, 'benchmarks', 'baseline.json')
+
+class InlineJob:
+    # stands in for jobs.JobContext when a job function is called directly
+    def progress(self, fraction, message = ''):
+        pass
+
+    def cancelled(self):
+        return False
+
+def run_job(fn, *args):
+    # through the real job pool, for results that later callbacks read back by job id
+    job_id = app.jobs.submit(fn, *args)
+    while app.jobs.status(job_id)['status'] in ('queued', 'running'):
+        time.sleep(0.01)
+    return job_id
+
+def measure(fn, repeat):
+    times = []
+    for _ in range(repeat):
+        t0 = time.perf_counter()
+        fn()
+        times.append(1000*(time.perf_counter() - t0))
+
+    tracemalloc.start()
+    fn()
+    _, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    return {'median_ms': round(statistics.median(times), 3), 'min_ms': round(min(times), 3), 'peak_kb': round(peak/1024, 1)}
+
+def install_names(df_names):
+    # same steps as load_data() for the names dataset (memory mode)
+    df_names, report = aggregate_duplicates(df_names, app.cat_type)
+    datasets.register('names', df_names, 'synthetic-' + str(len(df_names)))
+    datasets.add_derived('names', 'matrix', PayMatrix.from_frame(df_names, app.YEARS))
+    app.df_names = df_names
+    app.name_index = NameIndex.from_frame(df_names, DataSchema.NAME, DataSchema.YEAR, app.YEARS)
+    app.employee_directory = EmployeeDirectory.from_matrix(datasets.derived(datasets.ref('names'), 'matrix'), app.name_index.years_mask)
+    datasets.add_derived('names', 'raises', RaiseEngine.from_matrix(datasets.derived(datasets.ref('names'), 'matrix')))
+    return report
+
+def install_jobs():
+    app.df_jobs = app.read_jobs_csv()
+    datasets.register('jobs', app.df_jobs, 'benchmark')
+    datasets.add_derived('jobs', 'matrix', PayMatrix.from_frame(app.df_jobs, app.YEARS))
+    datasets.add_derived('jobs', 'wages', datasets.derived(datasets.ref('jobs'), 'matrix').to_records())
+
+def install_app(n_rows, seed = 0):
+    # stands in for load_data() (the app was imported with UC_WAGES_STARTUP_MODE=external); returns the names ingest report
+    install_jobs()
+    report = install_names(synthetic_names(n_rows, app.YEARS, seed=seed))
+    app.data_ready.set()
+    app.load_finished.set()
+    return report
+
+def with_trigger(prop_id, fn):
+    # callbacks that read callback_context need a request context with the triggering input
+    def run():
+        with app.server.test_request_context():
+            context_value.set(AttributeDict(triggered_inputs = [{'prop_id': prop_id, 'value': 1}]))
+            return fn()
+    return run
+
+def bench_scale(n_rows, repeat, seed):
+    results = {}
+    df = synthetic_names(n_rows, app.YEARS, seed=seed)
+
+    # one run only (it is the dataset being benchmarked), so reported as wall_ms rather than a median
+    t0 = time.perf_counter()
+    report = install_names(df)
+    results['load'] = {'wall_ms': round(1000*(time.perf_counter() - t0), 3), 'rows': report['rows_out'], 'entities': report['entities']}
+    del df
+
+    # queries: a common first name (many matches), a full name, a short fragment (scan path)
+    names = app.name_index.names
+    common_first = str(names[len(names)//2]).split(' ')[0]
+    full_name = str(names[len(names)//3])
+    for label, query in [('common', common_first), ('full', full_name), ('short', full_name[:2])]:
+        results['search_names[' + label + ']'] = measure(lambda: app.search_names_job(InlineJob(), query, None), repeat)
+
+    # typing one more letter: only the previous matches are re-checked
+    previous = app.search_matches(full_name[:-1])
+    results['search_names[refine]'] = measure(lambda: app.search_matches(full_name, previous['exact']), repeat)
+    # paging reads the matches back from a finished search job (like after search_names), it doesn't search again
+    search_results = {'job_id': run_job(app.search_names_job, common_first, None), 'query': common_first}
+    results['page_search_results'] = measure(lambda: app.page_search_results(search_results, 1, app.SEARCH_PAGE_SIZE, []), repeat)
+
+    # a handful of names, like a user comparing themselves with a few colleagues
+    selected = [str(name) for name in names[::max(1, len(names)//5)][:5]]
+    names_ref = datasets.ref('names')
+    jobs_ref = datasets.ref('jobs')
+    years = [app.YEARS[0], app.YEARS[-1]]
+    pay = DataSchema.PAY
+    DataSchema.PAY = app.DEFAULT_COMPENSATION      # filter_* read the compensation from the global, restored below
+    try:
+        results['filter_names_data'] = measure(lambda: app.filter_names_data(selected, names_ref, None), repeat)
+        results['filter_jobs_data'] = measure(lambda: app.filter_jobs_data(app.DEFAULT_JOBS, jobs_ref, None), repeat)
+        names_block = app.filter_names_data(selected, names_ref, None)
+        jobs_block = app.filter_jobs_data(app.DEFAULT_JOBS, jobs_ref, None)
+        results['filter_combined_data'] = measure(lambda: app.filter_combined_data(jobs_block, names_block, years), repeat)
+        combined_block = app.filter_combined_data(jobs_block, names_block, years)
+
+        def update_figures_cold():
+            app.result_cache = ResultCache(app.RESULT_CACHE_MAX_BYTES)
+            return app.update_figures_job(InlineJob(), combined_block, years, None, None, False)
+        results['update_figures[cold]'] = measure(update_figures_cold, repeat)
+        results['update_figures[warm]'] = measure(lambda: app.update_figures_job(InlineJob(), combined_block, years, None, None, False), repeat)
+
+        # raises of every employee over the full range (one summary per range, computed on first use)
+        def update_raises_cold():
+            datasets.add_derived('names', 'raises', RaiseEngine.from_matrix(datasets.derived(names_ref, 'matrix')))
+            return app.update_raises(names_ref, years, app.DEFAULT_COMPENSATION)
+        results['update_raises[cold]'] = measure(update_raises_cold, repeat)
+        results['update_raises[warm]'] = measure(lambda: app.update_raises(names_ref, years, app.DEFAULT_COMPENSATION), repeat)
+    finally:
+        DataSchema.PAY = pay
+
+    # the dispatching callbacks themselves (submit a job, return right away)
+    results['search_names[submit]'] = measure(with_trigger(app.ids.NAME_SEARCH_BUTTON + '.n_clicks',
+        lambda: app.search_names(1, full_name, None, None, None)), repeat)
+    return results
+
+def compare(results, baseline, tolerance):
+    # a benchmark regresses when its median time or peak memory grew by more than tolerance
+    regressions = []
+    for scale, benchmarks in results.items():
+        for name, result in benchmarks.items():
+            base = baseline.get(scale, {}).get(name)
+            if base is None:
+                continue
+            for metric in ['median_ms', 'wall_ms', 'peak_kb']:
+                if (metric in result) and (metric in base) and (base[metric] > 0) and (result[metric] > base[metric]*(1 + tolerance)):
+                    regressions.append((scale, name, metric, base[metric], result[metric]))
+    return regressions
+
+def main():
+    parser = argparse.ArgumentParser(description = 'benchmark the dash callbacks on synthetic data')
+    parser.add_argument('--scales', nargs='+', default=['100k', '1M'], choices=list(SCALES))
+    parser.add_argument('--repeat', type=int, default=5)
+    parser.add_argument('--seed', type=int, default=0)
+    parser.add_argument('--baseline', default=BASELINE_PATH)
+    parser.add_argument('--save-baseline', action='store_true', help='write the results as the new baseline')
+    parser.add_argument('--tolerance', type=float, default=0.2, help='allowed slowdown/memory growth before reporting a regression')
+    parser.add_argument('--out', help='also write the results to this json file')
+    args = parser.parse_args()
+
+    install_jobs()
+    app.data_ready.set()
+    app.load_finished.set()
+
+    results = {}
+    for scale in args.scales:
+        print('benchmarking ' + scale + ' rows:')
+        results[scale] = bench_scale(SCALES[scale], args.repeat, args.seed)
+        for name, result in results[scale].items():
+            print('  ' + name + ': ' + json.dumps(result))
+
+    if args.out:
+        with open(args.out, 'w') as f:
+            json.dump(results, f, indent=2)
+
+    if args.save_baseline:
+        baseline = {}
+        if os.path.exists(args.baseline):
+            with open(args.baseline) as f:
+                baseline = json.load(f)
+        baseline.update(results)
+        with open(args.baseline, 'w') as f:
+            json.dump(baseline, f, indent=2)
+        print('baseline written to ' + args.baseline)
+        return 0
+
+    if not os.path.exists(args.baseline):
+        print('no baseline at ' + args.baseline + ' (run with --save-baseline first)')
+        return 0
+    with open(args.baseline) as f:
+        regressions = compare(results, json.load(f), args.tolerance)
+    for scale, name, metric, before, after in regressions:
+        print('REGRESSION ' + scale + ' ' + name + ' ' + metric + ': ' + str(before) + ' -> ' + str(after))
+    if len(regressions) == 0:
+        print('no regressions (tolerance ' + str(args.tolerance) + ')')
+    return 1 if len(regressions) > 0 else 0
+
+if __name__ == '__main__':
+    sys.exit(main())
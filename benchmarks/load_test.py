@@ -0,0 +1,335 @@
+"""Replays user sessions against the dash callback endpoint and reports throughput and latency.
+
+    python benchmarks/load_test.py --sessions 50 --concurrency 8                     # in-process (flask test client)
+    python benchmarks/load_test.py --sessions 50 --concurrency 8 --synthetic 1M      # in-process, synthetic names data
+    python benchmarks/load_test.py --sessions 200 --concurrency 32 --workers 4       # starts a local gunicorn with 4 workers
+    python benchmarks/load_test.py --sessions 200 --concurrency 32 --url http://127.0.0.1:8050
+
+each session loads the page and then plays a script: close the landing modal, search a name, add the first result,
+drag the year slider, change the compensation type. like the browser, a session reads the callback graph from
+/_dash-dependencies, sends POST /_dash-update-component for every server-side callback whose inputs changed, applies
+the outputs and follows the chain (including the dcc.Interval polls of background jobs)
+serverside cache growth is read from /metrics before and after the run
+"""
+import argparse
+import collections
+import json
+import os
+import random
+import statistics
+import subprocess
+import sys
+import threading
+import time
+import urllib.error
+import urllib.request
+from concurrent.futures import ThreadPoolExecutor
+
+REPO_PATH = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, REPO_PATH)
+
+DEFAULT_QUERIES = ['john', 'maria', 'smith', 'nguyen', 'garcia', 'lee', 'kim', 'patel']
+MAX_INTERVAL_TICKS = 400        # a session gives up on a background job after this many polls
+UPDATE_PATH = '/_dash-update-component'
+
+# ------------- transports ----------------
+class TestClientTransport:
+    # in-process: requests go straight into app.server, no sockets
+    def __init__(self, server):
+        self.server = server
+        self._local = threading.local()
+
+    def client(self):
+        if getattr(self._local, 'client', None) is None:
+            self._local.client = self.server.test_client()
+        return self._local.client
+
+    def get(self, path):
+        response = self.client().get(path)
+        return response.status_code, response.get_json(silent=True)
+
+    def post(self, path, body):
+        response = self.client().post(path, json=body)
+        return response.status_code, (response.get_json(silent=True) if response.status_code == 200 else None)
+
+class HttpTransport:
+    def __init__(self, url):
+        self.url = url.rstrip('/')
+
+    def request(self, path, body = None):
+        data = None if body is None else json.dumps(body).encode()
+        request = urllib.request.Request(self.url + path, data=data, headers={'Content-Type': 'application/json'})
+        try:
+            with urllib.request.urlopen(request, timeout=120) as response:
+                content = response.read()
+                return response.status, (json.loads(content) if content else None)
+        except urllib.error.HTTPError as e:
+            return e.code, None
+
+    def get(self, path):
+        return self.request(path)
+
+    def post(self, path, body):
+        return self.request(path, body)
+
+# ------------- a minimal dash renderer ----------------
+def parse_outputs(output):
+    # '..a.b...c.d..' (several outputs) or 'a.b'
+    multi = output.startswith('..')
+    specs = output[2:-2].split('...') if multi else [output]
+    return multi, [{'id': spec.rsplit('.', 1)[0], 'property': spec.rsplit('.', 1)[1]} for spec in specs]
+
+def walk_components(node, found):
+    # (id, prop) -> value for every component with an id in a layout/children tree; intervals are remembered separately
+    if isinstance(node, list):
+        for child in node:
+            walk_components(child, found)
+    elif isinstance(node, dict) and ('props' in node) and ('type' in node):
+        props = node['props']
+        if 'id' in props:
+            for prop, value in props.items():
+                if prop != 'children':
+                    found['props'][(props['id'], prop)] = value
+            if node['type'] == 'Interval':
+                found['intervals'].add(props['id'])
+        walk_components(props.get('children'), found)
+
+class Session:
+    def __init__(self, transport, dependencies, layout, stats):
+        self.transport = transport
+        self.callbacks = {dependency['output']: dependency for dependency in dependencies if dependency.get('clientside_function') is None}
+        self.by_input = collections.defaultdict(list)
+        for callback in self.callbacks.values():
+            for dependency in callback['inputs']:
+                self.by_input[(dependency['id'], dependency['property'])].append(callback['output'])
+        self.downstream = {output: self.reachable(output) for output in self.callbacks}
+        found = {'props': {}, 'intervals': set()}
+        walk_components(layout, found)
+        self.props = found['props']
+        self.intervals = found['intervals']
+        self.stats = stats
+
+    def value(self, component_id, prop):
+        return self.props.get((component_id, prop))
+
+    def set(self, component_id, prop, value):
+        # a user action: change a prop and run everything that depends on it
+        self.props[(component_id, prop)] = value
+        self.run_chain([(component_id, prop)])
+        self.run_intervals()
+
+    def reachable(self, output):
+        # callbacks that can (transitively) be triggered by the outputs of this one
+        found = set()
+        stack = [output]
+        while len(stack) > 0:
+            _, outputs = parse_outputs(stack.pop())
+            for spec in outputs:
+                for next_output in self.by_input.get((spec['id'], spec['property']), []):
+                    if next_output not in found:
+                        found.add(next_output)
+                        stack.append(next_output)
+        return found
+
+    def run_chain(self, changed):
+        # like the dash renderer: every callback fires once with all of its changed inputs, and waits while another
+        # pending callback upstream of it could still change its inputs
+        pending = collections.defaultdict(set)      # callback output -> changed input keys
+        def trigger(keys):
+            for key in keys:
+                for output in self.by_input.get(key, []):
+                    pending[output].add(key)
+        trigger(changed)
+        while len(pending) > 0:
+            ready = [output for output in pending if not any((output in self.downstream[other]) for other in pending if other != output)]
+            if len(ready) == 0:
+                ready = list(pending)       # a cycle: fire everything
+            for output in ready:
+                trigger(self.call(self.callbacks[output], pending.pop(output)))
+
+    def call(self, callback, changed_keys):
+        multi, outputs = parse_outputs(callback['output'])
+        body = {
+            'output': callback['output'],
+            'outputs': outputs if multi else outputs[0],
+            'inputs': [dict(dependency, value=self.value(dependency['id'], dependency['property'])) for dependency in callback['inputs']],
+            'state': [dict(dependency, value=self.value(dependency['id'], dependency['property'])) for dependency in callback['state']],
+            'changedPropIds': [component_id + '.' + prop for component_id, prop in changed_keys],
+        }
+        t0 = time.perf_counter()
+        status, response = self.transport.post(UPDATE_PATH, body)
+        self.stats.record(callback['output'], 1000*(time.perf_counter() - t0), status)
+        if (status != 200) or (response is None):
+            return []       # 204: PreventUpdate
+
+        changed = []
+        for component_id, props in response.get('response', {}).items():
+            for prop, value in props.items():
+                self.props[(component_id, prop)] = value
+                changed.append((component_id, prop))
+                if prop == 'children':
+                    found = {'props': self.props, 'intervals': self.intervals}
+                    walk_components(value, found)
+        return changed
+
+    def run_intervals(self):
+        # enabled dcc.Intervals tick until their callbacks disable them again
+        for _ in range(MAX_INTERVAL_TICKS):
+            enabled = [interval for interval in self.intervals if self.value(interval, 'disabled') is False]
+            if len(enabled) == 0:
+                return
+            time.sleep(min([self.value(interval, 'interval') or 1000 for interval in enabled])/1000)
+            for interval in enabled:
+                self.props[(interval, 'n_intervals')] = (self.value(interval, 'n_intervals') or 0) + 1
+                self.run_chain([(interval, 'n_intervals')])
+
+def play_session(transport, dependencies, layout, stats, query):
+    # the user script
+    t0 = time.perf_counter()
+    status, _ = transport.get('/')
+    stats.record('GET /', 1000*(time.perf_counter() - t0), status)
+
+    session = Session(transport, dependencies, layout, stats)
+    session.set('close-modal-button', 'n_clicks', 1)
+
+    session.props[('name-search-input', 'value')] = query
+    session.set('name-search-button', 'n_clicks', 1)
+
+    rows = session.value('name-search-results-table', 'data')
+    if rows:
+        session.props[('name-search-results-table', 'active_cell')] = {'row': random.randrange(len(rows)), 'column': 0}
+        session.set('name-add-button', 'n_clicks', 1)
+
+    session.set('year-range-slider', 'value', [2013, 2019])
+    session.set('select-compensation-dropdown', 'value', 'Total Pay')
+    stats.record_session(1000*(time.perf_counter() - t0))
+
+# ------------- stats ----------------
+def percentiles(values):
+    if len(values) == 0:
+        return {}
+    values = sorted(values)
+    pick = lambda q: round(values[min(len(values) - 1, int(q*len(values)))], 3)
+    return {'count': len(values), 'mean': round(statistics.mean(values), 3), 'p50': pick(0.5), 'p90': pick(0.9), 'p99': pick(0.99), 'max': round(values[-1], 3)}
+
+class LoadStats:
+    def __init__(self):
+        self._lock = threading.Lock()
+        self.latencies = collections.defaultdict(list)      # callback output -> [ms]
+        self.errors = collections.Counter()
+        self.sessions = []
+
+    def record(self, name, ms, status):
+        with self._lock:
+            self.latencies[name].append(ms)
+            if status >= 400:
+                self.errors[name] += 1
+
+    def record_session(self, ms):
+        with self._lock:
+            self.sessions.append(ms)
+
+    def report(self, elapsed):
+        all_requests = [ms for values in self.latencies.values() for ms in values]
+        return {
+            'elapsed_s': round(elapsed, 3),
+            'sessions_per_s': round(len(self.sessions)/elapsed, 3),
+            'requests_per_s': round(len(all_requests)/elapsed, 3),
+            'session_ms': percentiles(self.sessions),
+            'request_ms': percentiles(all_requests),
+            'errors': dict(self.errors),
+            'callbacks': {name: percentiles(values) for name, values in sorted(self.latencies.items())},
+        }
+
+def serverside_cache_stats(transport):
+    # bytes_on_disk is the whole cache directory; the counters are those of the worker that answered
+    status, metrics = transport.get('/metrics')
+    return metrics.get('serverside_cache') if (status == 200) and (metrics is not None) else None
+
+# ------------- setup ----------------
+def start_gunicorn(workers, port):
+    env = dict(os.environ, WEB_CONCURRENCY=str(workers), BIND='127.0.0.1:' + str(port))
+    process = subprocess.Popen([sys.executable, '-m', 'gunicorn', '-c', 'gunicorn.conf.py'], cwd=REPO_PATH, env=env)
+    transport = HttpTransport('http://127.0.0.1:' + str(port))
+    for _ in range(600):
+        try:
+            status, _ = transport.get('/ready')
+            if status == 200:
+                return process, transport
+        except OSError:
+            pass
+        if process.poll() is not None:
+            raise RuntimeError('gunicorn exited with code ' + str(process.returncode))
+        time.sleep(0.5)
+    process.terminate()
+    raise RuntimeError('gunicorn did not become ready')
+
+def in_process_transport(synthetic):
+    if synthetic is None:
+        import app
+    else:
+        # the benchmark suite's setup: the app starts without its names data, the synthetic dataset is installed instead
+        import bench_callbacks
+        app = bench_callbacks.app
+        bench_callbacks.install_app(bench_callbacks.SCALES[synthetic])
+    return TestClientTransport(app.server)
+
+def main():
+    parser = argparse.ArgumentParser(description = 'load test the dash callback endpoint with scripted sessions')
+    parser.add_argument('--sessions', type=int, default=50)
+    parser.add_argument('--concurrency', type=int, default=8)
+    parser.add_argument('--queries', nargs='+', default=DEFAULT_QUERIES, help='names searched by the sessions (picked at random)')
+    parser.add_argument('--url', help='an already running server')
+    parser.add_argument('--workers', type=int, help='start a local gunicorn with this many workers')
+    parser.add_argument('--port', type=int, default=8765)
+    parser.add_argument('--synthetic', choices=['100k', '1M', '10M'], help='in-process only: use a synthetic names dataset')
+    parser.add_argument('--seed', type=int, default=0)
+    parser.add_argument('--out', help='also write the report to this json file')
+    args = parser.parse_args()
+    random.seed(args.seed)
+
+    process = None
+    if args.url is not None:
+        transport = HttpTransport(args.url)
+    elif args.workers is not None:
+        process, transport = start_gunicorn(args.workers, args.port)
+    else:
+        transport = in_process_transport(args.synthetic)
+
+    try:
+        transport.get('/')      # dash registers its callbacks on the first request
+        _, dependencies = transport.get('/_dash-dependencies')
+        _, layout = transport.get('/_dash-layout')
+        cache_before = serverside_cache_stats(transport)
+
+        stats = LoadStats()
+        t0 = time.perf_counter()
+        with ThreadPoolExecutor(max_workers=args.concurrency) as executor:
+            futures = [executor.submit(play_session, transport, dependencies, layout, stats, random.choice(args.queries)) for _ in range(args.sessions)]
+            for future in futures:
+                future.result()
+        report = stats.report(time.perf_counter() - t0)
+
+        cache_after = serverside_cache_stats(transport)
+        if (cache_before is not None) and (cache_after is not None):
+            report['serverside_cache'] = {
+                'bytes_before': cache_before['bytes_on_disk'],
+                'bytes_after': cache_after['bytes_on_disk'],
+                'bytes_per_session': round((cache_after['bytes_on_disk'] - cache_before['bytes_on_disk'])/max(1, args.sessions)),
+                'bytes_written': cache_after['bytes_written'] - cache_before['bytes_written'],
+                'evictions': cache_after['evictions'] - cache_before['evictions'],
+            }
+        report['config'] = {'sessions': args.sessions, 'concurrency': args.concurrency, 'workers': args.workers, 'url': args.url, 'synthetic': args.synthetic}
+    finally:
+        if process is not None:
+            process.terminate()
+            process.wait()
+
+    print(json.dumps(report, indent=2))
+    if args.out:
+        with open(args.out, 'w') as f:
+            json.dump(report, f, indent=2)
+    return 0
+
+if __name__ == '__main__':
+    sys.exit(main())
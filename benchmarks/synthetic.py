@@ -0,0 +1,60 @@
+import numpy as np
+import pandas as pd
+
+from schema import DataSchema
+from ingest import PAY_COLUMNS
+
+# ------------- synthetic name datasets ----------------
+# shaped like salaries_by_name: one row per (employee, year), employees stay a few contiguous years, common first/last names
+# are far more frequent than rare ones (so some names are shared by many employees), and a small share of
+# (name, year) rows are duplicated (a second appointment in the same year)
+
+SYLLABLES = ['an', 'be', 'car', 'da', 'el', 'fo', 'ga', 'hi', 'is', 'jo', 'ka', 'li', 'ma', 'ne', 'or', 'pa', 'qui', 'ro',
+             'sa', 'te', 'u', 'va', 'wi', 'xa', 'ya', 'zo', 'mar', 'son', 'ley', 'ton', 'rez', 'ez', 'lin', 'ber', 'go', 'ri']
+
+def name_pool(rng, size, n_syllables):
+    parts = rng.integers(0, len(SYLLABLES), (size*2, n_syllables))
+    names = pd.unique(pd.Series([''.join([SYLLABLES[i] for i in row]).capitalize() for row in parts]))
+    return np.asarray(names[:size], dtype=object)
+
+def skewed_choice(rng, size, n, offset = 10):
+    # rank r is picked with probability ~ 1/(r + offset)
+    weights = 1/(np.arange(size) + offset)
+    return rng.choice(size, n, p=weights/weights.sum())
+
+def synthetic_names(n_rows, years, seed = 0, mean_tenure = 4, duplicate_rate = 0.01):
+    rng = np.random.default_rng(seed)
+    years = np.asarray(years)
+    n_employees = max(1, int(n_rows/mean_tenure*1.2))
+
+    first_names = name_pool(rng, 3000, 2)
+    last_names = name_pool(rng, 50000, 3)
+    names = pd.Series(first_names[skewed_choice(rng, len(first_names), n_employees)]) + ' ' + pd.Series(last_names[skewed_choice(rng, len(last_names), n_employees)])
+
+    # each employee: a contiguous run of years, pay grows by their own yearly raise
+    tenure = np.minimum(rng.geometric(1/mean_tenure, n_employees), len(years))
+    start = rng.integers(0, len(years) - tenure + 1)
+    employee = np.repeat(np.arange(n_employees), tenure)[:n_rows]
+    offset = (np.arange(tenure.sum()) - np.repeat(np.cumsum(tenure) - tenure, tenure))[:n_rows]
+
+    base_pay = rng.lognormal(np.log(60000), 0.8, n_employees)
+    raise_rate = rng.normal(0.03, 0.02, n_employees)
+    pay = base_pay[employee]*(1 + raise_rate[employee])**offset
+    part_year = rng.random(len(employee)) < 0.1
+    pay[part_year] *= rng.uniform(0.3, 1, part_year.sum())
+    benefits = pay*rng.uniform(1.15, 1.35, len(employee))
+
+    df = pd.DataFrame({
+        DataSchema.NAME: names.to_numpy()[employee],
+        DataSchema.TOTAL_PAY: np.round(pay),
+        DataSchema.TOTAL_PAY_AND_BENEFITS: np.round(benefits),
+        DataSchema.YEAR: years[start[employee] + offset],
+    })
+
+    # second appointments: the same (name, year) again with a smaller pay
+    duplicates = df.sample(frac=duplicate_rate, random_state=seed)
+    duplicates[PAY_COLUMNS] = np.round(duplicates[PAY_COLUMNS]*0.2)
+    df = pd.concat([df, duplicates], ignore_index=True)
+
+    df[DataSchema.NAME] = df[DataSchema.NAME].astype('category')
+    return df
@@ -0,0 +1,118 @@
+import argparse
+import concurrent.futures
+import datetime
+import hashlib
+import json
+import os
+import time
+
+import pandas as pd
+import pyarrow as pa
+import pyarrow.parquet as pq
+
+from schema import DataSchema
+from ingest import PAY_COLUMNS, MANIFEST, aggregate_duplicates
+from population import percentile_bands
+
+# ------------- offline data build ----------------
+# turns the raw per-year UC salary CSVs into the artifacts the app loads:
+#   salaries_by_name.parquet   dictionary-encoded names, sorted by name then year, row-group statistics
+#   salaries_by_job.parquet    same layout for the job table
+#   manifest.json              job list, year domain, row counts, checksums, ingest report, UC-wide percentile bands
+#
+# usage: python build_data.py raw/2011.csv raw/2012.csv ... --out assets
+
+APP_PATH = os.path.dirname(os.path.abspath(__file__))
+NAME_ARTIFACT = "salaries_by_name.parquet"
+JOB_ARTIFACT = "salaries_by_job.parquet"
+
+def sha256(path):
+    h = hashlib.sha256()
+    with open(path, 'rb') as f:
+        for chunk in iter(lambda: f.read(1 << 20), b''):
+            h.update(chunk)
+    return h.hexdigest()
+
+def normalize_names(names):
+    # casefold + collapse whitespace, same normalization the name index applies to search queries
+    return names.astype(str).str.strip().str.replace(r'\s+', ' ', regex=True).str.casefold()
+
+def read_raw(path):
+    # one raw file (one year); runs in its own process
+    t0 = time.time()
+    df = pd.read_csv(path, usecols=[DataSchema.NAME, DataSchema.YEAR] + PAY_COLUMNS, dtype=str)
+    df[DataSchema.NAME] = normalize_names(df[DataSchema.NAME])
+    df[DataSchema.YEAR] = pd.to_numeric(df[DataSchema.YEAR], errors='coerce')
+    for column in PAY_COLUMNS:
+        # pay columns contain things like "Not Provided" / "Aggregate"
+        df[column] = pd.to_numeric(df[column].str.replace(r'[$,]', '', regex=True), errors='coerce')
+    df = df.dropna(subset=[DataSchema.NAME, DataSchema.YEAR])
+    df = df[df[DataSchema.NAME] != '']
+    df[DataSchema.YEAR] = df[DataSchema.YEAR].astype(int)
+    source = {'path': os.path.abspath(path), 'rows': int(len(df)), 'sha256': sha256(path), 'seconds': round(time.time() - t0, 3)}
+    return df, source
+
+def write_parquet(df, path, row_group_size):
+    # name as a dictionary column, year as a small int; row groups carry min/max statistics so readers can skip them
+    table = pa.table({
+        DataSchema.NAME: pa.DictionaryArray.from_arrays(
+            pa.array(df[DataSchema.NAME].cat.codes.to_numpy(), type=pa.int32()),
+            pa.array(df[DataSchema.NAME].cat.categories.astype(str))),
+        DataSchema.YEAR: pa.array(df[DataSchema.YEAR].astype(int).to_numpy(), type=pa.int16()),
+        DataSchema.TOTAL_PAY: pa.array(df[DataSchema.TOTAL_PAY].to_numpy(dtype=float), type=pa.float32()),
+        DataSchema.TOTAL_PAY_AND_BENEFITS: pa.array(df[DataSchema.TOTAL_PAY_AND_BENEFITS].to_numpy(dtype=float), type=pa.float32()),
+        DataSchema.ENTITY_ID: pa.array(df[DataSchema.ENTITY_ID].to_numpy(), type=pa.int32()),
+    })
+    pq.write_table(table, path, row_group_size=row_group_size, use_dictionary=[DataSchema.NAME], write_statistics=True, compression='zstd')
+    return {'path': os.path.basename(path), 'rows': int(len(df)), 'row_groups': pq.ParquetFile(path).num_row_groups, 'bytes': os.path.getsize(path), 'sha256': sha256(path)}
+
+def build(raw_paths, out_dir, jobs_path, workers, row_group_size):
+    t0 = time.time()
+    os.makedirs(out_dir, exist_ok=True)
+
+    # one process per raw file
+    with concurrent.futures.ProcessPoolExecutor(max_workers=workers) as executor:
+        results = list(executor.map(read_raw, raw_paths))
+    df_raw = pd.concat([df for df, _ in results], ignore_index=True)
+    sources = [source for _, source in results]
+    print('read ' + str(len(df_raw)) + ' rows from ' + str(len(raw_paths)) + ' files: ' + str(round(time.time() - t0, 3)))
+
+    years = sorted([int(year) for year in df_raw[DataSchema.YEAR].unique()])
+    year_type = pd.api.types.CategoricalDtype(categories=years, ordered=True)
+    df_names, names_report = aggregate_duplicates(df_raw, year_type)
+
+    df_jobs = pd.read_csv(jobs_path, usecols=[DataSchema.NAME, DataSchema.YEAR] + PAY_COLUMNS)
+    jobs = [str(job) for job in pd.unique(df_jobs[DataSchema.NAME])]          # keeps the order of the csv
+    # the app reads both artifacts with the names' year domain: job years outside it are dropped (see jobs_report['rows_out_of_range'])
+    df_jobs, jobs_report = aggregate_duplicates(df_jobs, year_type)
+
+    artifacts = {
+        'names': write_parquet(df_names, os.path.join(out_dir, NAME_ARTIFACT), row_group_size),
+        'jobs': write_parquet(df_jobs, os.path.join(out_dir, JOB_ARTIFACT), row_group_size),
+    }
+
+    manifest = {
+        'built_at': datetime.datetime.now(datetime.timezone.utc).isoformat(),
+        'years': years,
+        'jobs': jobs,
+        'artifacts': artifacts,
+        'sources': sources + [{'path': os.path.abspath(jobs_path), 'rows': int(len(df_jobs)), 'sha256': sha256(jobs_path)}],
+        'ingest': {'names': names_report, 'jobs': jobs_report},
+        'bands': percentile_bands(df_names, years),
+        'build_seconds': round(time.time() - t0, 3),
+    }
+    with open(os.path.join(out_dir, MANIFEST), 'w') as f:
+        json.dump(manifest, f, indent=2)
+    print('wrote ' + os.path.join(out_dir, MANIFEST) + ': ' + str(manifest['build_seconds']))
+    return manifest
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description='Build the optimized data artifacts for the dashboard from raw per-year UC salary CSVs.')
+    parser.add_argument('raw_paths', nargs='+', help='raw salary CSVs (one per year)')
+    parser.add_argument('--out', default=os.path.join(APP_PATH, 'assets'), help='output directory (default: assets/)')
+    parser.add_argument('--jobs', default=os.path.join(APP_PATH, 'assets', 'salaries_by_job.csv'), help='job table csv')
+    parser.add_argument('--workers', type=int, default=os.cpu_count(), help='number of parallel processes (default: all cores)')
+    parser.add_argument('--row-group-size', type=int, default=128*1024, help='rows per parquet row group')
+    args = parser.parse_args()
+
+    build(args.raw_paths, args.out, args.jobs, args.workers, args.row_group_size)
@@ -0,0 +1,103 @@
+import json
+import os
+import shutil
+import fcntl
+
+import numpy as np
+import pandas as pd
+from schema import DataSchema
+from ingest import PAY_COLUMNS
+
+# ------------- memory-mapped columnar datasets ----------------
+# one .npy file per column, opened with mmap_mode='r' so every gunicorn worker shares the same physical pages
+# (the page cache backs them, so there is no refcount-driven copy-on-write like with pickled/parsed frames)
+#   names -> integer codes (+ a json list of unique names)
+#   year  -> small integer codes into the year domain
+#   pay   -> int32 (float32 if the column has missing values)
+# only the frame itself is shared: what the app derives from it (pay matrices, name index, employee directory, raise
+# summaries) is built on the heap. With preload_app (eager startup) that happens before the fork and gc.freeze, so workers
+# start out sharing those pages too, but python objects (the index's name strings) get copied into a worker as their
+# refcounts change; with background startup every worker builds its own copy
+# one directory per source version; older versions are removed once a new one is built
+META_FILE = "meta.json"
+NAMES_FILE = "names.json"
+
+def codes_dtype(n_categories):
+    # same dtype pandas picks for categorical codes, so Categorical.from_codes can use the memmap without copying
+    if n_categories < np.iinfo(np.int8).max:
+        return np.int8
+    if n_categories < np.iinfo(np.int16).max:
+        return np.int16
+    if n_categories < np.iinfo(np.int32).max:
+        return np.int32
+    return np.int64
+
+def column_file(column):
+    return column.lower().replace(' & ', '_and_').replace(' ', '_') + '.npy'
+
+def write_columnar(df, directory, years):
+    os.makedirs(directory, exist_ok=True)
+
+    names = df[DataSchema.NAME]
+    if not isinstance(names.dtype, pd.CategoricalDtype):
+        names = names.astype('category')
+    names = names.cat.remove_unused_categories()
+    np.save(os.path.join(directory, column_file(DataSchema.NAME)), names.cat.codes.to_numpy().astype(codes_dtype(len(names.cat.categories))))
+    with open(os.path.join(directory, NAMES_FILE), 'w') as f:
+        json.dump([str(name) for name in names.cat.categories], f)
+
+    year_codes = pd.Index(years).get_indexer(df[DataSchema.YEAR].astype(int))
+    np.save(os.path.join(directory, column_file(DataSchema.YEAR)), year_codes.astype(codes_dtype(len(years))))
+
+    for column in PAY_COLUMNS:
+        pay = df[column].to_numpy(dtype=float)
+        pay = pay.astype(np.float32) if np.isnan(pay).any() else pay.astype(np.int32)
+        np.save(os.path.join(directory, column_file(column)), pay)
+
+    with open(os.path.join(directory, META_FILE), 'w') as f:
+        json.dump({'rows': len(df), 'years': [int(year) for year in years], 'columns': [DataSchema.NAME, DataSchema.YEAR] + PAY_COLUMNS}, f)
+
+def read_columnar(directory):
+    with open(os.path.join(directory, META_FILE)) as f:
+        meta = json.load(f)
+    with open(os.path.join(directory, NAMES_FILE)) as f:
+        names = json.load(f)
+
+    def load(column):
+        return np.load(os.path.join(directory, column_file(column)), mmap_mode='r')
+
+    year_type = pd.api.types.CategoricalDtype(categories=meta['years'], ordered=True)
+    columns = {
+        DataSchema.NAME: pd.Categorical.from_codes(load(DataSchema.NAME), categories=names),
+        DataSchema.YEAR: pd.Categorical.from_codes(load(DataSchema.YEAR), dtype=year_type),
+    }
+    for column in PAY_COLUMNS:
+        columns[column] = load(column)
+
+    # copy=False keeps each column backed by its own memmap instead of consolidating into new blocks
+    return pd.DataFrame(columns, copy=False)
+
+def remove_stale_versions(directory, version):
+    # other versions (and leftover .tmp builds); workers still mapping an old version keep its files until they exit
+    for entry in os.scandir(directory):
+        if entry.is_dir() and (entry.name != version):
+            shutil.rmtree(entry.path, ignore_errors=True)
+
+def load_columnar(directory, version, read_source, years):
+    # builds the columnar copy of a dataset once (per source version) and memory-maps it
+    # a lock file makes sure only one process builds it when several workers start at the same time
+    path = os.path.join(directory, version)
+    if not os.path.exists(os.path.join(path, META_FILE)):
+        os.makedirs(directory, exist_ok=True)
+        with open(os.path.join(directory, '.lock'), 'w') as lock_file:
+            fcntl.flock(lock_file, fcntl.LOCK_EX)
+            try:
+                if not os.path.exists(os.path.join(path, META_FILE)):
+                    tmp_path = path + '.tmp' + str(os.getpid())
+                    write_columnar(read_source(), tmp_path, years)
+                    shutil.rmtree(path, ignore_errors=True)
+                    os.rename(tmp_path, path)
+                    remove_stale_versions(directory, version)
+            finally:
+                fcntl.flock(lock_file, fcntl.LOCK_UN)
+    return read_columnar(path)
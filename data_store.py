@@ -0,0 +1,184 @@
+import hashlib
+import os
+import threading
+import time
+
+from dash_extensions.enrich import FileSystemStore
+
+from metrics import metrics
+
+# ------------- shared datasets ----------------
+# the base datasets (df_jobs, df_names) are loaded once per process and are read-only
+# callbacks pass around a tiny reference ({'id': ..., 'version': ...}) instead of pickling the whole frame per session
+
+def dataset_version(*paths):
+    # changes whenever any of the source files is rebuilt
+    h = hashlib.md5()
+    for path in paths:
+        st = os.stat(path)
+        h.update((str(path) + str(st.st_size) + str(st.st_mtime_ns)).encode())
+    return h.hexdigest()[:12]
+
+class SharedDatasets:
+    def __init__(self):
+        self._datasets = {}
+        self._versions = {}
+        self._derived = {}          # (dataset id, key) -> structure built from the dataset (index, matrix, ...)
+        self._stale_seen = set()    # (dataset id, version) of stale references already logged
+
+    def register(self, dataset_id, df, version):
+        self._datasets[dataset_id] = df
+        self._versions[dataset_id] = version
+        return self.ref(dataset_id)
+
+    def ref(self, dataset_id):
+        return {'id': dataset_id, 'version': self._versions[dataset_id]}
+
+    def version(self, dataset_id):
+        return self._versions[dataset_id]
+
+    def get(self, ref):
+        if ref is None:
+            return None
+        if ref['version'] != self._versions[ref['id']]:
+            # the dataset was rebuilt since this session started: serve the current build
+            # every use is counted on the callback's metrics record, but each stale version is only logged once
+            metrics.count('stale_dataset_refs')
+            stale = (ref['id'], ref['version'])
+            if stale not in self._stale_seen:
+                self._stale_seen.add(stale)
+                print('stale dataset reference: ' + ref['id'] + ' ' + ref['version'] + ' -> ' + self._versions[ref['id']])
+        return self._datasets[ref['id']]
+
+    def add_derived(self, dataset_id, key, obj):
+        self._derived[(dataset_id, key)] = obj
+
+    def derived(self, ref, key):
+        if ref is None:
+            return None
+        self.get(ref)
+        return self._derived[(ref['id'], key)]
+
+datasets = SharedDatasets()
+
+# ------------- serverside cache for per-session results ----------------
+# same as dash_extensions' FileSystemStore (threshold = max entries, default_timeout = ttl in seconds)
+# plus a bound on the total bytes on disk (least recently used entries are evicted first) and hit/miss/bytes counters
+# the total is kept as a running count (updated on set/delete), so a write doesn't stat the whole directory; the directory
+# is only scanned when the count goes over max_bytes, or every rescan_interval seconds (other workers and the ttl prune
+# change it too)
+class BoundedFileSystemStore(FileSystemStore):
+    def __init__(self, cache_dir, max_bytes, threshold = 500, default_timeout = 3600, rescan_interval = 60):
+        # set up before the base class: its __init__ writes the entry counter through our set()
+        self.cache_dir = cache_dir
+        self.max_bytes = max_bytes
+        self.rescan_interval = rescan_interval
+        self._lock = threading.Lock()
+        self._total_bytes = None        # running total, None until the first scan
+        self._scanned_at = 0
+        self.stats = {'hits': 0, 'misses': 0, 'bytes_read': 0, 'bytes_written': 0, 'evictions': 0}
+        super().__init__(cache_dir, threshold=threshold, default_timeout=default_timeout)
+
+    def get(self, key, *args, **kwargs):
+        value = super().get(key, *args, **kwargs)
+        filename = self._get_filename(key)
+        with self._lock:
+            if value is None:
+                self.stats['misses'] += 1
+            else:
+                self.stats['hits'] += 1
+                try:
+                    size = os.path.getsize(filename)
+                    self.stats['bytes_read'] += size
+                    metrics.count('cache_read_bytes', size)
+                    os.utime(filename)           # mark as recently used
+                except OSError:
+                    pass
+        return value
+
+    def file_size(self, key):
+        try:
+            return os.path.getsize(self._get_filename(key))
+        except OSError:
+            return 0
+
+    def set(self, key, value, *args, **kwargs):
+        old_size = self.file_size(key)
+        result = super().set(key, value, *args, **kwargs)
+        size = self.file_size(key)
+        with self._lock:
+            self.stats['bytes_written'] += size
+            if self._total_bytes is not None:
+                self._total_bytes += size - old_size
+        metrics.count('cache_write_bytes', size)
+        if kwargs.get('mgmt_element'):
+            # the entry counter (written by the base class, also from evict()): don't evict around it
+            return result
+        if self.total_bytes() > self.max_bytes:
+            self.evict()
+        return result
+
+    def delete(self, key, *args, **kwargs):
+        size = self.file_size(key)
+        result = super().delete(key, *args, **kwargs)
+        with self._lock:
+            if self._total_bytes is not None:
+                self._total_bytes -= size
+        return result
+
+    def entries(self):
+        # (last used, size, path) for every cache file, skipping the cache's own entry counter (stored under its hashed
+        # name like any other key) and half-written temporary files
+        count_file = os.path.basename(self._get_filename(self._fs_count_file))
+        entries = []
+        for entry in os.scandir(self.cache_dir):
+            if entry.is_file() and (entry.name != count_file) and not entry.name.endswith(self._fs_transaction_suffix):
+                try:
+                    st = entry.stat()
+                except OSError:
+                    continue
+                entries.append((st.st_mtime, st.st_size, entry.path))
+        return entries
+
+    def rescan(self):
+        entries = self.entries()
+        with self._lock:
+            self._total_bytes = sum([size for _, size, _ in entries])
+            self._scanned_at = time.time()
+        return entries
+
+    def total_bytes(self):
+        if (self._total_bytes is None) or (time.time() - self._scanned_at > self.rescan_interval):
+            self.rescan()
+        return self._total_bytes
+
+    def evict(self):
+        entries = self.rescan()
+        total_bytes = sum([size for _, size, _ in entries])
+        if total_bytes <= self.max_bytes:
+            return 0
+
+        n_evicted = 0
+        for _, size, path in sorted(entries):
+            if total_bytes <= self.max_bytes:
+                break
+            try:
+                os.remove(path)
+            except OSError:
+                continue
+            total_bytes -= size
+            n_evicted += 1
+
+        with self._lock:
+            self.stats['evictions'] += n_evicted
+            self._total_bytes = total_bytes
+        if hasattr(self, '_update_count'):
+            self._update_count(value=len(entries) - n_evicted)
+        return n_evicted
+
+    def get_stats(self):
+        with self._lock:
+            stats = dict(self.stats)
+        stats['bytes_on_disk'] = self.total_bytes()
+        stats['max_bytes'] = self.max_bytes
+        return stats
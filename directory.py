@@ -0,0 +1,117 @@
+import numpy as np
+
+from schema import DataSchema
+from ingest import PAY_COLUMNS
+
+# ------------- employee directory ----------------
+# one row per entity (same ids as the name index and the names pay matrix), built once at load:
+# years available (bitmask, shown as "2011, 2012, ..."), first/last year, and the pay of the last year for each compensation column
+# a page of search results is a gather of these columns, and sorting is an argsort over the matches
+
+YEARS_AVAILABLE = 'Years Available'
+FIRST_YEAR = 'First Year'
+LAST_YEAR = 'Last Year'
+
+def latest_label(column):
+    return 'Latest ' + column
+
+COLUMNS = [DataSchema.NAME, YEARS_AVAILABLE, FIRST_YEAR, LAST_YEAR] + [latest_label(column) for column in PAY_COLUMNS]
+
+def table_columns():
+    # DataTable column definitions
+    columns = [{'name': DataSchema.NAME, 'id': DataSchema.NAME}, {'name': YEARS_AVAILABLE, 'id': YEARS_AVAILABLE}]
+    columns += [{'name': label, 'id': label, 'type': 'numeric'} for label in [FIRST_YEAR, LAST_YEAR]]
+    columns += [{'name': latest_label(column), 'id': latest_label(column), 'type': 'numeric', 'format': {'specifier': '$,.0f'}} for column in PAY_COLUMNS]
+    return columns
+
+def year_positions(years_mask, n_years):
+    # positions of the first and last year in each mask (lowest/highest set bit)
+    has_year = ((np.asarray(years_mask, dtype=np.uint64)[:, None] >> np.arange(n_years, dtype=np.uint64)) & np.uint64(1)).astype(bool)
+    return np.argmax(has_year, axis=1), n_years - 1 - np.argmax(has_year[:, ::-1], axis=1)
+
+class EmployeeDirectory:
+    def __init__(self, names, years, years_mask, latest_pay):
+        self.names = np.asarray(names, dtype=object)
+        self.years = np.asarray(years, dtype=int)
+        self.years_mask = np.asarray(years_mask, dtype=np.uint64)
+        self.latest_pay = latest_pay        # {compensation column: pay in the last year, per entity}
+
+        self.first_year_pos, self.last_year_pos = year_positions(self.years_mask, len(self.years))
+
+        # "2011, 2012, ..." once per distinct mask (at most 2^len(years)), entities point to their mask
+        unique_masks, self.mask_codes = np.unique(self.years_mask, return_inverse=True)
+        self.mask_labels = np.array([', '.join([str(year) for i, year in enumerate(self.years) if int(mask) >> i & 1]) for mask in unique_masks], dtype=object)
+
+    @classmethod
+    def from_matrix(cls, matrix, years_mask):
+        # matrix: the names PayMatrix (rows = entity ids)
+        _, last_year_pos = year_positions(years_mask, len(matrix.years))
+        rows = np.arange(len(matrix))
+        latest_pay = {column: pay[rows, last_year_pos] for column, pay in matrix.pay.items()}
+        return cls(matrix.names, matrix.years, years_mask, latest_pay)
+
+    @classmethod
+    def from_disk(cls, store, years_mask):
+        # disk mode: one streaming pass over the entity/year/pay columns of the (entity id, year sorted) artifact,
+        # keeping the last row of each entity (batches may come in any order, so the latest year seen wins)
+        last_pay = {column: np.full(len(store.names), np.nan, dtype=np.float32) for column in PAY_COLUMNS}
+        last_year = np.full(len(store.names), -1, dtype=np.int64)
+        for batch in store.dataset.to_batches(columns = [DataSchema.ENTITY_ID, DataSchema.YEAR] + PAY_COLUMNS):
+            entity_ids = batch.column(DataSchema.ENTITY_ID).to_numpy()
+            if len(entity_ids) == 0:
+                continue
+            last = np.r_[entity_ids[1:] != entity_ids[:-1], True]
+            entity_ids = entity_ids[last]
+            years = batch.column(DataSchema.YEAR).to_numpy()[last].astype(np.int64)
+            newer = years >= last_year[entity_ids]
+            last_year[entity_ids[newer]] = years[newer]
+            for column in PAY_COLUMNS:
+                last_pay[column][entity_ids[newer]] = batch.column(column).to_numpy(zero_copy_only=False)[last][newer]
+        return cls(store.names, store.years, years_mask, last_pay)
+
+    def __len__(self):
+        return len(self.names)
+
+    def column(self, label, entity_ids):
+        entity_ids = np.asarray(entity_ids, dtype=np.int64)
+        if label == DataSchema.NAME:
+            return self.names[entity_ids]
+        if label == YEARS_AVAILABLE:
+            return self.mask_labels[self.mask_codes[entity_ids]]
+        if label == FIRST_YEAR:
+            return self.years[self.first_year_pos[entity_ids]]
+        if label == LAST_YEAR:
+            return self.years[self.last_year_pos[entity_ids]]
+        for column in PAY_COLUMNS:
+            if label == latest_label(column):
+                return self.latest_pay[column][entity_ids]
+        raise KeyError(label)
+
+    def sort(self, entity_ids, label, descending = False):
+        entity_ids = np.asarray(entity_ids, dtype=np.int64)
+        if label == DataSchema.NAME:
+            order = np.argsort(entity_ids, kind='stable')       # ids follow the sorted names
+        elif label == YEARS_AVAILABLE:
+            order = np.lexsort((self.years_mask[entity_ids], self.first_year_pos[entity_ids]))
+        else:
+            # blank (NaN) pay sorts last in both directions: flip the values instead of the order, NaN -> +inf
+            values = self.column(label, entity_ids).astype(float)
+            values = np.nan_to_num(-values if descending else values, nan=np.inf)
+            return entity_ids[np.argsort(values, kind='stable')]
+        return entity_ids[order[::-1] if descending else order]
+
+    def records(self, entity_ids):
+        # rows for the DataTable (json-friendly python types)
+        columns = {label: self.column(label, entity_ids) for label in COLUMNS}
+        records = []
+        for i in range(len(entity_ids)):
+            record = {}
+            for label, values in columns.items():
+                value = values[i]
+                if isinstance(value, np.floating):
+                    value = None if np.isnan(value) else float(value)
+                elif isinstance(value, np.integer):
+                    value = int(value)
+                record[label] = value
+            records.append(record)
+        return records
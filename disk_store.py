@@ -0,0 +1,95 @@
+import collections
+import threading
+
+import numpy as np
+import pandas as pd
+import pyarrow.dataset as ds
+
+from schema import DataSchema
+from ingest import PAY_COLUMNS
+from pay_matrix import PayBlock, sum_by_cell
+
+# ------------- on-disk name lookups ----------------
+# for datasets larger than RAM: df_names is never loaded, the rows of the selected names are read from the
+# name-sorted parquet artifact (build_data.py) with a filter on the entity id
+# since the file is sorted by entity id, the row-group min/max statistics let pyarrow skip every row group that can't match,
+# and only the year/pay columns are read
+# recently fetched entities are kept in a small LRU, so adding one more name to the dropdown only fetches that name
+class DiskNameStore:
+    def __init__(self, path, years, cache_size = 1024):
+        self.dataset = ds.dataset(path, format='parquet')
+        self.years = np.asarray(years, dtype=int)
+        self.cache_size = cache_size
+        self.names = None               # entity id -> name, set by index_frame()
+        self._cache = collections.OrderedDict()     # entity id -> {compensation column: dense row over years}
+        self._lock = threading.Lock()
+        self.stats = {'hits': 0, 'misses': 0, 'fetches': 0, 'rows_read': 0}
+
+    def index_frame(self):
+        # just the name and year columns, for building the NameIndex
+        # categories are put back in sorted order so that category codes == entity ids (see ingest.aggregate_duplicates)
+        df = self.dataset.to_table(columns=[DataSchema.NAME, DataSchema.YEAR]).to_pandas()
+        names = df[DataSchema.NAME].astype('category')
+        df[DataSchema.NAME] = names.cat.reorder_categories(sorted(names.cat.categories))
+        self.names = pd.Index(df[DataSchema.NAME].cat.categories)
+        return df
+
+    def __len__(self):
+        return len(self.names)
+
+    def cache_bytes(self):
+        with self._lock:
+            return sum([row.nbytes for rows in self._cache.values() for row in rows.values()])
+
+    def clear(self):
+        with self._lock:
+            self._cache.clear()
+
+    def fetch(self, entity_ids):
+        table = self.dataset.to_table(
+            columns = [DataSchema.ENTITY_ID, DataSchema.YEAR] + PAY_COLUMNS,
+            filter = ds.field(DataSchema.ENTITY_ID).isin(entity_ids)
+        )
+        df = table.to_pandas()
+        rows = pd.Index(entity_ids).get_indexer(df[DataSchema.ENTITY_ID])
+        cols = pd.Index(self.years).get_indexer(df[DataSchema.YEAR].astype(int))
+        valid = (rows >= 0) & (cols >= 0)
+
+        dense = {}
+        for column in PAY_COLUMNS:
+            values = df[column].to_numpy(dtype=float)[valid]
+            dense[column] = sum_by_cell(rows[valid], cols[valid], values, (len(entity_ids), len(self.years))).astype(np.float32)
+
+        with self._lock:
+            self.stats['fetches'] += 1
+            self.stats['rows_read'] += len(df)
+        return {entity_id: {column: dense[column][i] for column in PAY_COLUMNS} for i, entity_id in enumerate(entity_ids)}
+
+    def select(self, names, column):
+        # same interface as PayMatrix.select
+        entity_ids = self.names.get_indexer(names)
+        entity_ids = [int(entity_id) for entity_id in entity_ids if entity_id >= 0]
+
+        found = {}
+        with self._lock:
+            for entity_id in entity_ids:
+                if entity_id in self._cache:
+                    self._cache.move_to_end(entity_id)
+                    found[entity_id] = self._cache[entity_id]
+            self.stats['hits'] += len(found)
+            self.stats['misses'] += len(entity_ids) - len(found)
+
+        missing = [entity_id for entity_id in entity_ids if entity_id not in found]
+        if len(missing) > 0:
+            fetched = self.fetch(missing)
+            found.update(fetched)
+            with self._lock:
+                self._cache.update(fetched)
+                while len(self._cache) > self.cache_size:
+                    self._cache.popitem(last=False)
+
+        if len(entity_ids) == 0:
+            pay = np.empty((0, len(self.years)), dtype=np.float32)
+        else:
+            pay = np.vstack([found[entity_id][column] for entity_id in entity_ids])
+        return PayBlock(self.names[entity_ids].to_numpy(), self.years, pay, column)
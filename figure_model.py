@@ -0,0 +1,98 @@
+import hashlib
+import heapq
+import uuid
+import numpy as np
+
+# ------------- server-side figure model ----------------
+# one per figure per session (kept in the serverside cache)
+# remembers which name is drawn in which trace slot on the client, plus a fingerprint of each trace's data,
+# so update_figures only sends the traces that were added/changed/removed instead of the whole figure
+# (the delta is applied in the browser by assets/figure_delta.js)
+# every update gets a new version; a delta names the version it was built on ('base'), and the browser only applies
+# it on top of that version (two jobs built on the same model, e.g. a trigger that arrived before the previous job's
+# result was applied, would otherwise put traces in the wrong slots): on a mismatch it asks for a full refresh instead
+
+def series_fingerprint(x, y):
+    h = hashlib.md5()
+    h.update(np.asarray(x, dtype=float).tobytes())
+    h.update(np.asarray(y, dtype=float).tobytes())
+    return h.hexdigest()
+
+def line_trace(name, x, y):
+    # plain dict instead of go.Scatter: it goes straight into the delta json
+    return {'type': 'scatter', 'name': name, 'x': np.asarray(x).tolist(), 'y': np.asarray(y).tolist(), 'hovertemplate': '$%{y}'}
+
+def factor_trace(name, x, factors):
+    # y is filled in by the browser as factors*initial wage (assets/figure_delta.js, apply_scaled_delta)
+    return {'type': 'scatter', 'name': name, 'x': np.asarray(x).tolist(), 'y': [], 'customdata': np.asarray(factors).tolist(), 'hovertemplate': '$%{y}'}
+
+# emptied slots are reused by the next added names; once more than this many are empty (and they outnumber the live
+# traces) the figure is compacted: live traces are renumbered 0..n-1 and the client gets a reset delta
+COMPACT_THRESHOLD = 32
+
+class FigureModel:
+    def __init__(self, years, layout, trace = line_trace, compact_threshold = COMPACT_THRESHOLD):
+        self.years = list(years)
+        self.layout = layout
+        self.trace = trace              # (name, x, y) -> trace dict
+        self.compact_threshold = compact_threshold
+        self.slots = {}                 # name -> trace index in figure['data']
+        self.fingerprints = {}          # trace index -> fingerprint of what the client has
+        self.free_slots = []            # heap of emptied trace indices
+        self.n_slots = 0
+        self.reset = True               # the next delta replaces the client figure (new layout, no traces)
+        self.version = None             # of the last delta, None before the first one
+
+    def new_slot(self):
+        if len(self.free_slots) > 0:
+            return heapq.heappop(self.free_slots)
+        self.n_slots += 1
+        return self.n_slots - 1
+
+    def compact(self):
+        self.slots = {}
+        self.fingerprints = {}
+        self.free_slots = []
+        self.n_slots = 0
+        self.reset = True
+
+    def update(self, series):
+        # series: {name: (x, y)} of everything that should be drawn
+        # returns the delta: {'reset': bool, 'layout': layout or None, 'set': [[slot, trace], ...], 'clear': [slot, ...],
+        #                     'base': version it applies on top of, 'version': version after it}
+        clear = []
+        for name in list(self.slots):
+            if name not in series:
+                slot = self.slots.pop(name)
+                del self.fingerprints[slot]
+                heapq.heappush(self.free_slots, slot)
+                clear.append(slot)
+
+        n_free = len(self.free_slots) - min(len(self.free_slots), len(set(series) - set(self.slots)))     # still empty after the additions
+        if (n_free > self.compact_threshold) and (n_free > len(series)):
+            self.compact()
+            clear = []
+
+        set_traces = []
+        for name, (x, y) in series.items():
+            fingerprint = series_fingerprint(x, y)
+            if name in self.slots:
+                slot = self.slots[name]
+                if self.fingerprints[slot] == fingerprint:
+                    continue
+            else:
+                slot = self.new_slot()
+                self.slots[name] = slot
+            self.fingerprints[slot] = fingerprint
+            set_traces.append([slot, self.trace(name, x, y)])
+
+        # cleared slots that were refilled in this same update don't need clearing
+        refilled = set([slot for slot, _ in set_traces])
+        clear = [slot for slot in clear if slot not in refilled]
+
+        base = self.version
+        self.version = uuid.uuid4().hex
+        delta = {'reset': self.reset, 'layout': self.layout if self.reset else None, 'set': set_traces, 'clear': clear,
+                 'base': base, 'version': self.version}
+        self.reset = False
+        return delta
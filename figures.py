@@ -0,0 +1,207 @@
+import functools
+
+import numpy as np
+import pandas as pd
+
+# plotly.graph_objects (and its validators) is imported where a figure is built, not at import: workers and
+# the /ready check come up without it, and the templates below are built on first use
+
+class colors:
+    PLOT_BACKGROUND_COLOR = "#eaf1f5"
+    END_MARKER_COLOR = "#355218"
+    START_MARKER_COLOR = "#759356"
+    LOLLIPOP_LINE_COLOR = "#7B7B7B"
+    GRID_LINES_COLOR = "#C5CCCA"
+    BAND_OUTER_COLOR = "rgba(123, 123, 123, 0.15)"
+    BAND_INNER_COLOR = "rgba(123, 123, 123, 0.25)"
+    BAND_MEDIAN_COLOR = "#7B7B7B"
+    RAISE_BAR_COLOR = "#355218"
+    RAISE_HISTOGRAM_COLOR = "#759356"
+
+# ------------- templates (built once on first use instead of on every callback) -----
+@functools.lru_cache(maxsize=None)
+def line_template():
+    import plotly.graph_objects as go
+    template = go.layout.Template()
+    template.layout = go.Layout(
+        paper_bgcolor=colors.PLOT_BACKGROUND_COLOR,
+        plot_bgcolor=colors.PLOT_BACKGROUND_COLOR,
+        showlegend=False,
+        title_font=dict(family="Arial", size=18),
+        yaxis=dict(linewidth=1, linecolor = "black",
+            showgrid=True,  gridcolor = colors.GRID_LINES_COLOR, gridwidth=1,
+            title = dict(text = "Compensation (USD)"),
+            automargin = True,
+            showline = True,
+            fixedrange = True),
+        xaxis=dict(zeroline = False,
+            showgrid=True,  gridcolor = colors.GRID_LINES_COLOR, gridwidth=1,
+            showline = True, linewidth=1, linecolor = "black",
+            dtick = 1,
+            fixedrange = True
+            ),
+        hovermode="x"
+    )
+    return template
+
+@functools.lru_cache(maxsize=None)
+def lollipop_template():
+    import plotly.graph_objects as go
+    template = go.layout.Template()
+    template.layout = go.Layout(
+        paper_bgcolor=colors.PLOT_BACKGROUND_COLOR,
+        plot_bgcolor=colors.PLOT_BACKGROUND_COLOR,
+        showlegend=False,
+        title_font=dict(family="Arial", size=24),
+        yaxis=dict(linewidth=1, linecolor = "black",
+            showgrid=True,  gridcolor = colors.GRID_LINES_COLOR, gridwidth=1,
+            automargin = True,
+            showline = False,
+            fixedrange = True
+        ),
+        xaxis=dict(zeroline = False, rangemode = "tozero",
+            title = dict(text = "Compensation (USD)"),
+            showgrid=True,  gridcolor = colors.GRID_LINES_COLOR, gridwidth=1,
+            showline = True, linewidth=1, linecolor = "black",
+            fixedrange = True
+            )
+    )
+    return template
+
+# ------------- lollipop ----------------
+def lollipop_frame(block, names, top_n = None):
+    # pivot_wider the first and last years for names that span both, sorted by ascending (max year, min year) pay
+    min_year, max_year = block.years[0], block.years[-1]
+    block = block.subset(np.isin(block.names, list(names)) & block.spanning())
+    df_lollipop = pd.DataFrame({min_year: block.pay[:, 0], max_year: block.pay[:, -1]}, index = block.names.astype(str))
+
+    order = np.lexsort((df_lollipop[min_year].to_numpy(), df_lollipop[max_year].to_numpy()))
+    df_lollipop = df_lollipop.iloc[order]
+
+    # top-n mode: keep the n highest paid (at max year), collapse the rest into a single median row at the bottom
+    if (top_n is not None) and (len(df_lollipop) > top_n):
+        df_remaining = df_lollipop.iloc[:len(df_lollipop) - top_n]
+        df_remaining = pd.DataFrame(
+            {min_year: [df_remaining[min_year].median()], max_year: [df_remaining[max_year].median()]},
+            index = ['Remaining ' + str(len(df_remaining)) + ' employees (median)']
+        )
+        df_lollipop = pd.concat([df_remaining, df_lollipop.iloc[len(df_lollipop) - top_n:]])
+
+    return df_lollipop
+
+def build_lollipop(block, names, top_n = None):
+    import plotly.graph_objects as go
+    fig_lollipop = go.Figure(layout=dict(template=lollipop_template()))
+    if (block is None) or (len(names) == 0) or (len(block.years) == 0):
+        return fig_lollipop
+
+    df_lollipop = lollipop_frame(block, names, top_n)
+    if len(df_lollipop) == 0:
+        return fig_lollipop
+    min_year, max_year = df_lollipop.columns[0], df_lollipop.columns[-1]
+
+    lollipop_x_start = df_lollipop[min_year].to_numpy()
+    lollipop_x_end = df_lollipop[max_year].to_numpy()
+    lollipop_y = df_lollipop.index.to_numpy()
+
+    # all connecting lines in a single trace, segments separated by gaps (None)
+    n = len(df_lollipop)
+    line_x = np.full(3*n, None, dtype=object)
+    line_y = np.full(3*n, None, dtype=object)
+    line_x[0::3] = lollipop_x_start
+    line_x[1::3] = lollipop_x_end
+    line_y[0::3] = lollipop_y
+    line_y[1::3] = lollipop_y
+
+    fig_lollipop.add_trace(go.Scatter(
+                    x = line_x,
+                    y = line_y,
+                    mode = "lines",
+                    hoverinfo = "skip",
+                    line=dict(color=colors.LOLLIPOP_LINE_COLOR, width=3)))
+
+    fig_lollipop.add_trace(go.Scatter(
+                    name=str(min_year) + " Compensation",
+                    x=lollipop_x_start,
+                    y=lollipop_y,
+                    mode = "markers",
+                    marker_symbol = "circle",
+                    marker_size = 15,
+                    marker_color=colors.START_MARKER_COLOR,
+                )
+    )
+
+    fig_lollipop.add_trace(go.Scatter(
+                    name=str(max_year) + " Compensation",
+                    x=lollipop_x_end,
+                    y=lollipop_y,
+                    mode = "markers",
+                    marker_size = 15,
+                    marker_color=colors.END_MARKER_COLOR)
+    )
+    return fig_lollipop
+
+# layout json sent with a figure reset delta (see figure_model.py); callers must not mutate it
+@functools.lru_cache(maxsize=None)
+def line_layout():
+    import plotly.graph_objects as go
+    return go.Figure(layout=dict(template=line_template())).to_plotly_json()['layout']
+
+# ------------- UC-wide percentile bands ----------------
+# traces for the real wages figure, drawn behind the employee/job lines; marked with meta='band' so that
+# assets/figure_delta.js keeps them apart from the figure model's trace slots
+def band_traces(bands, column, min_year, max_year):
+    band = bands[column]
+    keep = [i for i, year in enumerate(band['years']) if min_year <= year <= max_year]
+    x = [band['years'][i] for i in keep]
+    y = {p: [band[p][i] for i in keep] for p in band if p != 'years'}
+
+    # plain dicts like figure_model.line_trace: they go straight into the store json
+    traces = []
+    for low, high, fill_color, name in [('p10', 'p90', colors.BAND_OUTER_COLOR, 'UC 10th-90th percentile'), ('p25', 'p75', colors.BAND_INNER_COLOR, 'UC 25th-75th percentile')]:
+        traces.append({'type': 'scatter', 'x': x, 'y': y[low], 'mode': 'lines', 'line': {'width': 0}, 'hoverinfo': 'skip', 'meta': 'band'})
+        traces.append({'type': 'scatter', 'x': x, 'y': y[high], 'mode': 'lines', 'line': {'width': 0}, 'fill': 'tonexty', 'fillcolor': fill_color, 'name': name, 'hoverinfo': 'skip', 'meta': 'band'})
+    traces.append({'type': 'scatter', 'x': x, 'y': y['p50'], 'mode': 'lines', 'line': {'color': colors.BAND_MEDIAN_COLOR, 'dash': 'dash', 'width': 2}, 'name': 'UC median', 'hovertemplate': '$%{y}', 'meta': 'band'})
+    return traces
+
+# ------------- raise inequality (all employees) ----------------
+# from a raises.raise_summary: median absolute raise per starting pay decile (median % raise as text), next to the
+# histogram of absolute raises
+def build_raise_chart(summary):
+    import plotly.graph_objects as go
+    from plotly.subplots import make_subplots
+    fig_raises = make_subplots(rows=1, cols=2, horizontal_spacing=0.12,
+        subplot_titles=('Median raise by starting pay decile', 'Distribution of raises'))
+    fig_raises.update_layout(paper_bgcolor=colors.PLOT_BACKGROUND_COLOR, plot_bgcolor=colors.PLOT_BACKGROUND_COLOR, showlegend=False)
+    fig_raises.update_xaxes(showgrid=True, gridcolor=colors.GRID_LINES_COLOR, showline=True, linewidth=1, linecolor="black", fixedrange=True)
+    fig_raises.update_yaxes(showgrid=True, gridcolor=colors.GRID_LINES_COLOR, showline=True, linewidth=1, linecolor="black", fixedrange=True, automargin=True)
+    if (summary is None) or (summary['count'] == 0):
+        return fig_raises
+
+    min_year, max_year = summary['years']
+    deciles = summary['deciles']
+    fig_raises.add_trace(go.Bar(
+                    x = [decile['decile'] for decile in deciles],
+                    y = [decile['median_absolute'] for decile in deciles],
+                    text = ['{:+.1f}%'.format(decile['median_percent']) for decile in deciles],
+                    customdata = [[decile['start_min'], decile['start_max'], decile['count']] for decile in deciles],
+                    hovertemplate = str(min_year) + ' pay $%{customdata[0]:,.0f} to $%{customdata[1]:,.0f}<br>'
+                        + '%{customdata[2]:,} employees<br>median raise $%{y:,.0f} (%{text})<extra></extra>',
+                    marker_color = colors.RAISE_BAR_COLOR),
+        row=1, col=1)
+
+    histogram = summary['absolute_histogram']
+    edges = histogram['edges']
+    fig_raises.add_trace(go.Bar(
+                    x = [(low + high)/2 for low, high in zip(edges[:-1], edges[1:])],
+                    y = histogram['counts'],
+                    width = [high - low for low, high in zip(edges[:-1], edges[1:])],
+                    hovertemplate = 'raise around $%{x:,.0f}<br>%{y:,} employees<extra></extra>',
+                    marker_color = colors.RAISE_HISTOGRAM_COLOR),
+        row=1, col=2)
+
+    fig_raises.update_xaxes(title_text='Decile of ' + str(min_year) + ' compensation', dtick=1, row=1, col=1)
+    fig_raises.update_yaxes(title_text='Raise ' + str(min_year) + '-' + str(max_year) + ' (USD)', row=1, col=1)
+    fig_raises.update_xaxes(title_text='Raise ' + str(min_year) + '-' + str(max_year) + ' (USD)', row=1, col=2)
+    fig_raises.update_yaxes(title_text='Employees', row=1, col=2)
+    return fig_raises
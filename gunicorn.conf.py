@@ -0,0 +1,15 @@
+import gc
+import os
+
+# gunicorn -c gunicorn.conf.py
+# the app (and its data) is loaded once in the master process and then forked into the workers
+# with UC_WAGES_DATA_MODE=mmap the names data lives in memory-mapped files, so memory per host stays flat as workers are added
+wsgi_app = "app:server"
+# with UC_WAGES_STARTUP_MODE=background each worker loads the data in its own thread instead (threads do not survive the fork)
+preload_app = os.environ.get("UC_WAGES_STARTUP_MODE", "eager") != "background"
+workers = int(os.environ.get("WEB_CONCURRENCY", 4))
+bind = os.environ.get("BIND", "0.0.0.0:8050")
+
+def pre_fork(server, worker):
+    # move everything loaded so far out of the garbage collector's reach, otherwise gc touching the objects copies their pages into every worker
+    gc.freeze()
@@ -0,0 +1,89 @@
+import json
+import os
+
+import numpy as np
+import pandas as pd
+from schema import DataSchema
+
+# ------------- ingest-time cleanup ----------------
+# done once when a dataset is loaded/built so that callbacks never have to deal with duplicates
+
+PAY_COLUMNS = [DataSchema.TOTAL_PAY, DataSchema.TOTAL_PAY_AND_BENEFITS]
+MANIFEST = "manifest.json"          # written by build_data.py next to the artifacts
+
+AMBIGUOUS_EXAMPLES = 20            # names listed in the report as examples of summed (name, year) rows
+
+def aggregate_duplicates(df, year_type):
+    # (name, year) pairs that appear more than once are added together (e.g. one employee with several appointments)
+    # returns a name/year sorted frame with an entity id and a report of what was merged
+    # TODO: handle "duplicates" with common names: several people sharing a name are summed into one entity as well;
+    # nothing here tells them apart (the raw Job Title could help, but people change titles between years), so these
+    # are not resolved, only counted and listed in the report (ambiguous_names, ambiguous_name_examples)
+    # rows whose year is outside year_type (or missing) or without a name are dropped and counted (rows_out_of_range)
+    # works on the name codes: only the unique names are ever turned into python strings, not the rows
+    rows_in = len(df)
+    year = df[DataSchema.YEAR]
+    year = year.astype(float) if isinstance(year.dtype, pd.CategoricalDtype) else pd.to_numeric(year, errors='coerce')
+    names = df[DataSchema.NAME]
+    if not isinstance(names.dtype, pd.CategoricalDtype):
+        names = names.astype('category')
+    codes = names.cat.codes.to_numpy()
+    keep = year.isin(list(year_type.categories)).to_numpy() & (codes >= 0)
+
+    # entity id = position of the name in the sorted list of unique names of this build
+    # (the same id is the row of the name in the pay matrix and in the name index, since they are built from the categories)
+    # it is a per-build row id, not a stable identity: adding or removing a name shifts the ids after it, so ids never
+    # leave the process (sessions hold names, and cached results are keyed by dataset version)
+    used_codes = np.unique(codes[keep])
+    labels = names.cat.categories[used_codes].astype(str).to_numpy()
+    order = np.argsort(labels, kind='stable')
+    entity_of_code = np.full(len(names.cat.categories), -1, dtype=np.int64)
+    entity_of_code[used_codes[order]] = np.arange(len(order))
+
+    df = pd.DataFrame({DataSchema.ENTITY_ID: entity_of_code[codes[keep]], DataSchema.YEAR: year.to_numpy()[keep].astype(int)}
+        | {column: df[column].to_numpy()[keep] for column in PAY_COLUMNS})
+    key = [DataSchema.ENTITY_ID, DataSchema.YEAR]
+    duplicated = df.duplicated(subset=key, keep=False).to_numpy()
+
+    if duplicated.any():
+        df_duplicates = df.loc[duplicated].groupby(key, sort=False)[PAY_COLUMNS].sum(min_count=1).reset_index()
+        df_out = pd.concat([df.loc[~duplicated], df_duplicates], ignore_index=True)
+        ambiguous_names = df_duplicates[DataSchema.ENTITY_ID].unique()
+    else:
+        df_out = df.reset_index(drop=True)
+        ambiguous_names = np.array([], dtype=np.int64)
+
+    df_out = df_out.sort_values(by=key, kind='mergesort', ignore_index=True)
+    entity_ids = df_out[DataSchema.ENTITY_ID].to_numpy()
+    name_type = pd.api.types.CategoricalDtype(categories=labels[order], ordered=False)
+    df_out.insert(0, DataSchema.NAME, pd.Categorical.from_codes(entity_ids, dtype=name_type))
+    df_out[DataSchema.YEAR] = df_out[DataSchema.YEAR].astype(year_type)
+    df_out[DataSchema.ENTITY_ID] = entity_ids.astype('int32')
+    df_out = df_out[[DataSchema.NAME, DataSchema.YEAR] + PAY_COLUMNS + [DataSchema.ENTITY_ID]]
+
+    report = {
+        'rows_in': int(rows_in),
+        'rows_out': int(len(df_out)),
+        'rows_out_of_range': int(rows_in - len(df)),
+        'duplicate_rows': int(duplicated.sum()),
+        'rows_merged': int(len(df) - len(df_out)),
+        'entities': int(len(name_type.categories)),
+        'ambiguous_names': int(len(ambiguous_names)),
+        'ambiguous_name_examples': [str(name) for name in labels[order][np.sort(ambiguous_names)[:AMBIGUOUS_EXAMPLES]]],
+    }
+    return df_out, report
+
+def read_manifest(directory):
+    # None if the artifacts were not built with build_data.py
+    path = os.path.join(directory, MANIFEST)
+    if not os.path.exists(path):
+        return None
+    with open(path) as f:
+        return json.load(f)
+
+def read_artifact(path, year_type):
+    # artifacts from build_data.py are already merged, name/year sorted and dictionary-encoded: no per-row parsing needed
+    # (pyarrow unifies the per-row-group name dictionaries into one categorical)
+    df = pd.read_parquet(path, engine='pyarrow')
+    df[DataSchema.YEAR] = df[DataSchema.YEAR].astype(year_type)
+    return df
@@ -0,0 +1,166 @@
+import os
+import pickle
+import json
+import threading
+import time
+import traceback
+import uuid
+from concurrent.futures import ThreadPoolExecutor
+
+from metrics import metrics
+
+# ------------- background jobs ----------------
+# long-running callbacks (name search, figure building) submit their work here and return right away, so the web
+# worker is free to serve cheap callbacks; the browser then polls for the result with a dcc.Interval
+# status and results are files in a local directory (no broker), so a poll can be answered by any gunicorn worker
+# scope: the pool is threads of the web worker, not separate processes, so jobs share the worker's data, result cache
+# and single-flight coalescing (a pool process would need its own copies, uncounted by /memory, and a pool forked from
+# a threaded worker can inherit held locks); what moves off the request path is the waiting (I/O, the data load,
+# numpy/pyarrow work that releases the GIL), while pure-python CPU work in a job still shares the worker's GIL with the
+# request threads, so CPU-bound load is isolated by scaling gunicorn workers, not UC_WAGES_JOB_WORKERS
+# a job can be cancelled (e.g. superseded by a newer search); jobs check for it whenever they report progress
+# a job can also be submitted with a delay (debounce): it waits on a timer, not in the pool, and cancelling it drops the timer
+
+class JobCancelled(Exception):
+    pass
+
+class JobContext:
+    def __init__(self, manager, job_id):
+        self.manager = manager
+        self.job_id = job_id
+
+    def cancelled(self):
+        return self.manager.is_cancelled(self.job_id)
+
+    def progress(self, fraction, message = ''):
+        if self.cancelled():
+            raise JobCancelled()
+        self.manager.write_status(self.job_id, 'running', fraction, message)
+
+class JobManager:
+    def __init__(self, directory, max_workers = 2, result_ttl = 600):
+        self.directory = directory
+        self.result_ttl = result_ttl            # seconds before finished jobs are pruned
+        self.executor = ThreadPoolExecutor(max_workers=max_workers, thread_name_prefix='background-job')
+        self._cancel_events = {}                # job id -> Event, for jobs running in this process
+        self._timers = {}                       # job id -> Timer, for delayed jobs not yet in the pool
+        self._lock = threading.Lock()
+        self._n_submitted = 0
+        os.makedirs(directory, exist_ok=True)
+
+    def path(self, job_id, ext):
+        return os.path.join(self.directory, job_id + '.' + ext)
+
+    def write_status(self, job_id, status, progress = 0, message = '', error = None):
+        tmp_path = self.path(job_id, 'status.tmp')
+        with open(tmp_path, 'w') as f:
+            json.dump({'status': status, 'progress': progress, 'message': message, 'error': error}, f)
+        os.replace(tmp_path, self.path(job_id, 'status'))
+
+    def submit(self, fn, *args, cancel = None, delay = 0):
+        # fn(context, *args) runs in the pool; cancel = id of a job this one supersedes
+        # delay: seconds before the job enters the pool (no pool thread is held while waiting)
+        self.cancel(cancel)
+        job_id = uuid.uuid4().hex
+        self.write_status(job_id, 'queued')
+        with self._lock:
+            self._cancel_events[job_id] = threading.Event()
+            self._n_submitted += 1
+            prune = self._n_submitted % 100 == 0
+            if delay > 0:
+                timer = threading.Timer(delay, self._start, args=(job_id, fn, args))
+                timer.daemon = True
+                self._timers[job_id] = timer
+        if delay > 0:
+            timer.start()
+        else:
+            self.executor.submit(self._run, job_id, fn, args)
+        if prune:
+            self.prune()
+        return job_id
+
+    def run_inline(self, fn, *args, cancel = None):
+        # runs the job in the calling thread and returns its id with the result already written, for work known to be
+        # cheap (e.g. a view already in the result cache): the caller reads it back like any job, without polling
+        self.cancel(cancel)
+        job_id = uuid.uuid4().hex
+        self.write_status(job_id, 'queued')
+        self._run(job_id, fn, args)
+        return job_id
+
+    def _start(self, job_id, fn, args):
+        with self._lock:
+            self._timers.pop(job_id, None)
+        if self.is_cancelled(job_id):
+            self._finish_cancelled(job_id)
+            return
+        self.executor.submit(self._run, job_id, fn, args)
+
+    def cancel(self, job_id):
+        if job_id is None:
+            return
+        open(self.path(job_id, 'cancel'), 'w').close()      # seen by whichever worker runs the job
+        with self._lock:
+            event = self._cancel_events.get(job_id)
+            timer = self._timers.pop(job_id, None)
+        if event is not None:
+            event.set()
+        if timer is not None:
+            # still waiting out its delay: never reaches the pool
+            timer.cancel()
+            self._finish_cancelled(job_id)
+
+    def _finish_cancelled(self, job_id):
+        self.write_status(job_id, 'cancelled')
+        with self._lock:
+            self._cancel_events.pop(job_id, None)
+
+    def is_cancelled(self, job_id):
+        with self._lock:
+            event = self._cancel_events.get(job_id)
+        return ((event is not None) and event.is_set()) or os.path.exists(self.path(job_id, 'cancel'))
+
+    def _run(self, job_id, fn, args):
+        try:
+            if self.is_cancelled(job_id):
+                raise JobCancelled()
+            self.write_status(job_id, 'running')
+            with metrics.track('job:' + fn.__name__):
+                result = fn(JobContext(self, job_id), *args)
+            if self.is_cancelled(job_id):
+                raise JobCancelled()
+            tmp_path = self.path(job_id, 'pkl.tmp')
+            with open(tmp_path, 'wb') as f:
+                pickle.dump(result, f, protocol=pickle.HIGHEST_PROTOCOL)
+            os.replace(tmp_path, self.path(job_id, 'pkl'))
+            self.write_status(job_id, 'done', 1)
+        except JobCancelled:
+            self.write_status(job_id, 'cancelled')
+        except Exception as e:
+            if type(e).__name__ != 'PreventUpdate':
+                traceback.print_exc()
+            self.write_status(job_id, 'error', error=type(e).__name__, message=str(e))
+        finally:
+            with self._lock:
+                self._cancel_events.pop(job_id, None)
+
+    def status(self, job_id):
+        if job_id is None:
+            return None
+        try:
+            with open(self.path(job_id, 'status')) as f:
+                return json.load(f)
+        except (OSError, ValueError):
+            return None
+
+    def result(self, job_id):
+        with open(self.path(job_id, 'pkl'), 'rb') as f:
+            return pickle.load(f)
+
+    def prune(self):
+        for entry in os.scandir(self.directory):
+            try:
+                if time.time() - entry.stat().st_mtime > self.result_ttl:
+                    os.remove(entry.path)
+            except OSError:
+                pass
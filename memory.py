@@ -0,0 +1,107 @@
+import gc
+import os
+import resource
+import sys
+
+# ------------- memory accounting ----------------
+# sizes of what a worker holds: base datasets (per column), derived pay matrices and the name index, caches, the
+# serverside cache bytes written per callback call (from metrics.py) and the process RSS
+# budgets are optional: over the RSS budget the in-memory caches are dropped, over the serverside cache budget the
+# store evicts (see enforce_budgets)
+
+def frame_memory(df):
+    # bytes per column (categories included); in 'mmap' mode these pages are shared by all workers
+    if df is None:
+        return None
+    usage = df.memory_usage(deep=True, index=True)
+    return {str(column): int(n_bytes) for column, n_bytes in usage.items()} | {'total': int(usage.sum())}
+
+def matrix_memory(matrix):
+    if matrix is None:
+        return None
+    if hasattr(matrix, 'pay'):
+        # PayMatrix
+        sizes = {str(column): int(pay.nbytes) for column, pay in matrix.pay.items()}
+        sizes['names'] = int(matrix.names.memory_usage(deep=True))
+    else:
+        # DiskNameStore: only the LRU of fetched entities is in memory
+        sizes = {'cache': int(matrix.cache_bytes())}
+    sizes['total'] = sum(sizes.values())
+    return sizes
+
+def name_index_memory(index):
+    if index is None:
+        return None
+    sizes = {
+        'names': int(sum([sys.getsizeof(name) for name in index.names]) + index.names.nbytes),
+        'keys': int(sum([sys.getsizeof(key) for key in index.keys]) + sys.getsizeof(index.keys)),
+        'postings': int(sum([postings.nbytes for postings in index.postings.values()])),
+        'years_mask': int(index.years_mask.nbytes),
+    }
+    sizes['total'] = sum(sizes.values())
+    return sizes
+
+def directory_memory(directory):
+    if directory is None:
+        return None
+    arrays = [directory.years_mask, directory.first_year_pos, directory.last_year_pos, directory.mask_codes] + list(directory.latest_pay.values())
+    sizes = {'columns': int(sum([array.nbytes for array in arrays])), 'mask_labels': int(sum([sys.getsizeof(label) for label in directory.mask_labels]))}
+    sizes['total'] = sum(sizes.values())        # names are shared with the index (counted in name_index_memory)
+    return sizes
+
+def process_memory():
+    # current and peak resident set size of this worker
+    sizes = {}
+    try:
+        with open('/proc/self/status') as f:
+            for line in f:
+                if line.startswith('VmRSS:'):
+                    sizes['rss_bytes'] = int(line.split()[1])*1024
+                elif line.startswith('VmHWM:'):
+                    sizes['peak_rss_bytes'] = int(line.split()[1])*1024
+    except OSError:
+        pass
+    if 'peak_rss_bytes' not in sizes:
+        # ru_maxrss is in KB on linux, bytes on macos
+        max_rss = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+        sizes['peak_rss_bytes'] = max_rss if sys.platform == 'darwin' else max_rss*1024
+    sizes['pid'] = os.getpid()
+    return sizes
+
+def callback_cache_writes(metrics):
+    # serverside cache bytes written per call of each callback: one entry holds all the ServersideOutputs of the
+    # callback (e.g. poll_figures writes both traces-in-* stores), so this is per callback, not per dcc.Store
+    payloads = {}
+    for name, stats in list(metrics.callbacks.items()):
+        histogram = stats.cache_write_bytes
+        if histogram.count > 0:
+            payloads[name] = {
+                'outputs': stats.output,
+                'count': histogram.count,
+                'mean': histogram.sum/histogram.count,
+                'max': histogram.max,
+                'p99': histogram.quantile(0.99),
+            }
+    return payloads
+
+def check_budgets(report, budgets):
+    # budgets: {'rss_bytes', 'serverside_cache_bytes'} (any subset); returns the ones exceeded
+    measured = {
+        'rss_bytes': report['process'].get('rss_bytes'),
+        'serverside_cache_bytes': report['caches']['serverside_cache_bytes'],
+    }
+    return {name: {'budget': budget, 'measured': measured[name]}
+            for name, budget in budgets.items() if (measured.get(name) is not None) and (measured[name] > budget)}
+
+def enforce_budgets(report, budgets, caches, store):
+    # over the RSS budget: drop the caches that can be recomputed (caches: objects with a clear() method)
+    # over the serverside cache budget: evict least recently used entries (store: BoundedFileSystemStore)
+    exceeded = check_budgets(report, budgets)
+    if 'rss_bytes' in exceeded:
+        for cache in caches:
+            cache.clear()
+        gc.collect()
+        print('memory budget exceeded, caches cleared: ' + str(exceeded))
+    if 'serverside_cache_bytes' in exceeded:
+        store.evict()
+    return exceeded
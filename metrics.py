@@ -0,0 +1,167 @@
+import bisect
+import contextlib
+import json
+import threading
+import time
+
+import flask
+
+# ------------- callback instrumentation ----------------
+# every dash callback request (POST /_dash-update-component) is timed by flask hooks, so no callback has to opt in;
+# inside a request (or a background job, see jobs.py) the current thread has a "record" that collects:
+#   - named sections (metrics.section('pandas'), metrics.section('figures')) for where the time went
+#   - counters (metrics.count('cache_read_bytes', n)), e.g. from the serverside cache
+# finished records are aggregated per callback into fixed-bucket histograms, served as json on /metrics
+
+TIME_BUCKETS = [1, 2, 5, 10, 20, 50, 100, 200, 500, 1000, 2000, 5000, 10000, 30000]       # ms
+SIZE_BUCKETS = [1e2, 1e3, 1e4, 1e5, 1e6, 1e7, 1e8]      # bytes
+
+class Histogram:
+    def __init__(self, bounds):
+        self.bounds = bounds
+        self.counts = [0]*(len(bounds) + 1)     # last bucket is everything above the last bound
+        self.count = 0
+        self.sum = 0
+        self.max = 0
+
+    def add(self, value):
+        self.counts[bisect.bisect_left(self.bounds, value)] += 1
+        self.count += 1
+        self.sum += value
+        self.max = max(self.max, value)
+
+    def quantile(self, q):
+        # upper bound of the bucket holding the q-th value (the max for the overflow bucket)
+        if self.count == 0:
+            return None
+        rank = q*self.count
+        seen = 0
+        for i, n in enumerate(self.counts):
+            seen += n
+            if seen >= rank:
+                return self.bounds[i] if i < len(self.bounds) else self.max
+        return self.max
+
+    def to_dict(self):
+        return {
+            'count': self.count,
+            'mean': (self.sum/self.count) if self.count > 0 else None,
+            'max': self.max,
+            'p50': self.quantile(0.5), 'p90': self.quantile(0.9), 'p99': self.quantile(0.99),
+            'buckets': {('<=' + str(bound)): n for bound, n in zip(self.bounds, self.counts)} | {'inf': self.counts[-1]},
+        }
+
+class CallbackStats:
+    def __init__(self, output = None):
+        self.output = output        # dash output spec ('..a.data...b.data..'), None for background jobs
+        self.wall_ms = Histogram(TIME_BUCKETS)
+        self.payload_bytes = Histogram(SIZE_BUCKETS)
+        self.sections_ms = {}       # section name -> Histogram
+        self.counters = {}          # counter name -> total
+        self.cache_write_bytes = Histogram(SIZE_BUCKETS)        # serverside cache bytes written per call (= size of the stores it outputs)
+        self.errors = 0
+
+    def add(self, record):
+        self.wall_ms.add(record['wall_ms'])
+        if record['payload_bytes'] is not None:
+            self.payload_bytes.add(record['payload_bytes'])
+        for section, ms in record['sections'].items():
+            self.sections_ms.setdefault(section, Histogram(TIME_BUCKETS)).add(ms)
+        for counter, n in record['counters'].items():
+            self.counters[counter] = self.counters.get(counter, 0) + n
+        if 'cache_write_bytes' in record['counters']:
+            self.cache_write_bytes.add(record['counters']['cache_write_bytes'])
+        if record['status'] >= 400:
+            self.errors += 1
+
+    def to_dict(self):
+        return {
+            'wall_ms': self.wall_ms.to_dict(),
+            'payload_bytes': self.payload_bytes.to_dict(),
+            'sections_ms': {section: histogram.to_dict() for section, histogram in self.sections_ms.items()},
+            'counters': self.counters,
+            'cache_write_bytes': self.cache_write_bytes.to_dict(),
+            'errors': self.errors,
+        }
+
+class Metrics:
+    def __init__(self, slow_ms = None):
+        self.slow_ms = slow_ms          # log records slower than this (None: no slow log)
+        self.callbacks = {}             # callback name -> CallbackStats
+        self.extra = {}                 # name -> function returning stats of other components (caches etc.)
+        self._lock = threading.Lock()
+        self._local = threading.local()
+
+    # --- records (one per thread) ---
+    def begin(self, name, output = None):
+        self._local.record = {'name': name, 'output': output, 't0': time.perf_counter(), 'sections': {}, 'counters': {}}
+
+    def end(self, payload_bytes = None, status = 200):
+        record = getattr(self._local, 'record', None)
+        if record is None:
+            return None
+        self._local.record = None
+        record['wall_ms'] = round(1000*(time.perf_counter() - record.pop('t0')), 3)
+        record['payload_bytes'] = payload_bytes
+        record['status'] = status
+        with self._lock:
+            self.callbacks.setdefault(record['name'], CallbackStats(record['output'])).add(record)
+        if (self.slow_ms is not None) and (record['wall_ms'] > self.slow_ms):
+            print('slow callback: ' + json.dumps(record))
+        return record
+
+    @contextlib.contextmanager
+    def track(self, name):
+        self.begin(name)
+        status = 200
+        try:
+            yield
+        except BaseException:
+            status = 500
+            raise
+        finally:
+            self.end(status = status)
+
+    @contextlib.contextmanager
+    def section(self, name):
+        t0 = time.perf_counter()
+        try:
+            yield
+        finally:
+            record = getattr(self._local, 'record', None)
+            if record is not None:
+                record['sections'][name] = record['sections'].get(name, 0) + round(1000*(time.perf_counter() - t0), 3)
+
+    def count(self, counter, n = 1):
+        record = getattr(self._local, 'record', None)
+        if record is not None:
+            record['counters'][counter] = record['counters'].get(counter, 0) + n
+
+    # --- flask ---
+    def init_app(self, app, route = '/metrics'):
+        # app: the dash app; callbacks are keyed by function name and output spec ('update_figures:figures-job.data'),
+        # so two callbacks with the same function name never share histograms
+        server = app.server
+
+        @server.before_request
+        def begin_callback():
+            if flask.request.path.endswith('/_dash-update-component'):
+                body = flask.request.get_json(silent=True) or {}
+                output = body.get('output', '?')
+                callback = app.callback_map.get(output, {}).get('callback')
+                self.begin(getattr(callback, '__name__', '?') + ':' + output, output)
+
+        @server.after_request
+        def end_callback(response):
+            if flask.request.path.endswith('/_dash-update-component'):
+                self.end(payload_bytes = response.calculate_content_length(), status = response.status_code)
+            return response
+
+        @server.route(route)
+        def metrics():
+            with self._lock:
+                callbacks = {name: stats.to_dict() for name, stats in self.callbacks.items()}
+            return flask.jsonify({'callbacks': callbacks} | {name: get_stats() for name, get_stats in self.extra.items()})
+
+# module instance, shared by app.py, data_store.py and jobs.py
+metrics = Metrics()
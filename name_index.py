@@ -0,0 +1,137 @@
+import heapq
+
+import numpy as np
+import pandas as pd
+
+# ------------- name index ----------------
+# built once at startup over the unique employee names (the categories of the name column), not the rows
+# search cost scales with the rarest trigram's posting list + the number of matches, not the dataset size
+# rank() is the fuzzy version: names are scored by the trigrams they share with the query, so misspelled queries still match
+
+NGRAM = 3
+RANK_CANDIDATES = 200           # best trigram scores that get the exact-match bonus before the final top k
+
+def normalize_name(name):
+    return ' '.join(str(name).casefold().split())
+
+def name_ngrams(key, n = NGRAM):
+    return {key[i:i + n] for i in range(len(key) - n + 1)}
+
+def padded_ngrams(key, n = NGRAM):
+    # with a space on each side, so that word starts/ends and 1-2 letter queries have trigrams too
+    return name_ngrams(' ' + key + ' ', n)
+
+class NameIndex:
+    def __init__(self, names, years_mask, years):
+        self.names = np.asarray(names, dtype=object)
+        self.keys = [normalize_name(name) for name in self.names]      # precomputed casefolded keys
+        self.years_mask = np.asarray(years_mask, dtype=np.uint64)       # bit i set if the name has data for years[i]
+        self.years = list(years)
+
+        # trigram -> sorted array of name ids (padded trigrams include every plain trigram, so search() can use them too)
+        postings = {}
+        self.n_grams = np.zeros(len(self.keys), dtype=np.int16)        # number of distinct trigrams per name, for scoring
+        for i, key in enumerate(self.keys):
+            grams = padded_ngrams(key)
+            self.n_grams[i] = len(grams)
+            for gram in grams:
+                postings.setdefault(gram, []).append(i)
+        self.postings = {gram: np.array(name_ids, dtype=np.int32) for gram, name_ids in postings.items()}
+
+    @classmethod
+    def from_frame(cls, df, name_col, year_col, years):
+        names = df[name_col]
+        if not isinstance(names.dtype, pd.CategoricalDtype):
+            names = names.astype('category')
+        name_codes = names.cat.codes.to_numpy()
+        year_pos = pd.Index(years).get_indexer(df[year_col].astype(int))
+
+        # OR together one bit per (name, year) row
+        valid = (name_codes >= 0) & (year_pos >= 0)
+        years_mask = np.zeros(len(names.cat.categories), dtype=np.uint64)
+        np.bitwise_or.at(years_mask, name_codes[valid], np.left_shift(np.uint64(1), year_pos[valid].astype(np.uint64)))
+
+        return cls(names.cat.categories, years_mask, years)
+
+    def __len__(self):
+        return len(self.names)
+
+    def candidates(self, key):
+        # ids of names that have every trigram of key
+        grams = name_ngrams(key)
+        if len(grams) == 0:
+            # query shorter than a trigram: scan the unique keys (still never the rows)
+            return range(len(self.keys))
+        posting_lists = []
+        for gram in grams:
+            if gram not in self.postings:
+                return []
+            posting_lists.append(self.postings[gram])
+        posting_lists.sort(key=len)                                 # intersect starting from the rarest trigram
+        candidates = posting_lists[0]
+        for posting_list in posting_lists[1:]:
+            candidates = np.intersect1d(candidates, posting_list, assume_unique=True)
+            if len(candidates) == 0:
+                return []
+        return candidates
+
+    def search(self, query, limit = None, candidates = None):
+        # returns ids of names containing query (case-insensitive), stopping after limit matches
+        # candidates: only verify these ids (e.g. the matches of a shorter query that the new one contains)
+        key = normalize_name(query)
+        if key == '':
+            return []
+
+        if candidates is None:
+            candidates = self.candidates(key)
+
+        # trigrams only guarantee the letters are there, verify the substring
+        matches = []
+        for i in candidates:
+            if key in self.keys[i]:
+                matches.append(int(i))
+                if (limit is not None) and (len(matches) >= limit):
+                    break
+        return matches
+
+    def sort_matches(self, query, name_ids, limit = None):
+        # names starting with the query first, then shorter names, then alphabetical (ids follow the sorted names)
+        # limit: keep only the best limit names (a partial sort, so every match is ranked before any is dropped)
+        key = normalize_name(query)
+        if (limit is not None) and (len(name_ids) > limit):
+            name_ids = heapq.nsmallest(limit, name_ids, key=lambda i: (not self.keys[i].startswith(key), len(self.keys[i]), i))
+            return np.asarray(name_ids, dtype=np.int64)
+        name_ids = np.asarray(name_ids, dtype=np.int64)
+        not_prefix = np.array([not self.keys[i].startswith(key) for i in name_ids], dtype=bool)
+        lengths = np.array([len(self.keys[i]) for i in name_ids], dtype=np.int64)
+        return name_ids[np.lexsort((name_ids, lengths, not_prefix))]
+
+    def rank(self, query, k = 20, min_score = 0.2):
+        # best k (name id, score) by trigram similarity (Jaccard) to the query, best first
+        # names containing the query as typed get +1 (so they come before misspelled matches), starting with it +0.5
+        key = normalize_name(query)
+        if key == '':
+            return []
+        grams = [gram for gram in padded_ngrams(key) if gram in self.postings]
+        if len(grams) == 0:
+            return []
+
+        # shared trigrams per name = how many of the query's posting lists it appears in
+        shared = np.bincount(np.concatenate([self.postings[gram] for gram in grams]), minlength=len(self.keys))
+        candidates = np.flatnonzero(shared)
+        n_query_grams = len(padded_ngrams(key))
+        scores = shared[candidates]/(n_query_grams + self.n_grams[candidates] - shared[candidates])
+        keep = scores >= min_score
+        candidates, scores = candidates[keep], scores[keep]
+
+        # bounded top-k: partial sort of the best RANK_CANDIDATES (or k, if larger), then the exact-match bonus
+        n_best = min(len(candidates), max(k, RANK_CANDIDATES))
+        if n_best < len(candidates):
+            best = np.argpartition(-scores, n_best - 1)[:n_best]
+            candidates, scores = candidates[best], scores[best]
+        ranked = []
+        for i, score in zip(candidates, scores):
+            name_key = self.keys[i]
+            bonus = (1 if key in name_key else 0) + (0.5 if name_key.startswith(key) else 0)
+            ranked.append((int(i), float(score) + bonus))
+        return heapq.nlargest(k, ranked, key=lambda item: (item[1], -item[0]))
@@ -0,0 +1,122 @@
+import numpy as np
+import pandas as pd
+from schema import DataSchema
+
+# ------------- dense pay matrix ----------------
+# the year domain is fixed and tiny, so pay is stored as a dense (entity x year) matrix per compensation column, NaN where missing
+# selecting names is a row gather, selecting a year range is a column slice (a view), and
+# "has both the min and max year" is a vectorized check on the first/last column
+
+def sum_by_cell(rows, cols, values, shape):
+    # sums values that land in the same (row, col) cell; cells with no (non-missing) values are NaN
+    flat = rows*shape[1] + cols
+    present = ~np.isnan(values)
+    sums = np.bincount(flat[present], weights=values[present], minlength=shape[0]*shape[1])
+    counts = np.bincount(flat[present], minlength=shape[0]*shape[1])
+    return np.where(counts > 0, sums, np.nan).reshape(shape)
+
+class PayMatrix:
+    def __init__(self, names, years, pay):
+        self.names = pd.Index(names)
+        self.years = np.asarray(years, dtype=int)
+        self.pay = pay          # {compensation column: 2D float array}
+
+    @classmethod
+    def from_frame(cls, df, years, columns = (DataSchema.TOTAL_PAY, DataSchema.TOTAL_PAY_AND_BENEFITS)):
+        names = df[DataSchema.NAME]
+        if not isinstance(names.dtype, pd.CategoricalDtype):
+            names = names.astype('category')
+        rows = names.cat.codes.to_numpy().astype(np.int64)
+        cols = pd.Index(years).get_indexer(df[DataSchema.YEAR].astype(int)).astype(np.int64)
+        valid = (rows >= 0) & (cols >= 0)
+        shape = (len(names.cat.categories), len(years))
+
+        # duplicate (name, year) rows are added together, same as filter_combined_data used to do per callback
+        pay = {}
+        for column in columns:
+            values = df[column].to_numpy(dtype=float)[valid]
+            pay[column] = sum_by_cell(rows[valid], cols[valid], values, shape).astype(np.float32)
+        return cls(names.cat.categories, years, pay)
+
+    def __len__(self):
+        return len(self.names)
+
+    def to_records(self):
+        # {column: {name: {year: pay}}} without the missing cells, for small tables that go to the browser
+        records = {}
+        for column, pay in self.pay.items():
+            records[column] = {}
+            for name, row in zip(self.names, pay):
+                records[column][str(name)] = {int(year): float(value) for year, value in zip(self.years, row) if not np.isnan(value)}
+        return records
+
+    def select(self, names, column):
+        rows = self.names.get_indexer(names)
+        rows = rows[rows >= 0]
+        return PayBlock(self.names[rows].to_numpy(), self.years, self.pay[column][rows], column)
+
+class PayBlock:
+    # a few selected rows of a PayMatrix (for one compensation column), optionally narrowed to a year range
+    def __init__(self, names, years, pay, column = None, sources = None):
+        self.names = np.asarray(names, dtype=object)
+        self.years = np.asarray(years, dtype=int)
+        self.pay = pay
+        self.column = column        # compensation column the block was gathered from
+        # dataset id(s) each row came from ('jobs', 'names', or 'jobs+names' for a merged row), None if unknown
+        self.sources = None if sources is None else np.asarray(sources, dtype=object)
+
+    def tagged(self, dataset_id):
+        # the same rows, marked as coming from dataset_id
+        return PayBlock(self.names, self.years, self.pay, self.column, np.full(len(self.names), dataset_id, dtype=object))
+
+    def labels(self):
+        # names qualified by their dataset, so that a job title and an employee with the same name never look alike
+        if self.sources is None:
+            return [str(name) for name in self.names]
+        return [str(source) + ':' + str(name) for source, name in zip(self.sources, self.names)]
+
+    @classmethod
+    def concat(cls, blocks):
+        blocks = [block for block in blocks if block is not None]
+        if len(blocks) == 0:
+            return None
+        names = np.concatenate([block.names for block in blocks])
+        pay = np.vstack([block.pay for block in blocks])
+        sources = None
+        if all([block.sources is not None for block in blocks]):
+            sources = np.concatenate([block.sources for block in blocks])
+
+        # the same name in more than one block (e.g. a job and a name) is added together
+        codes, unique_names = pd.factorize(names)
+        if len(unique_names) < len(names):
+            n_years = pay.shape[1]
+            rows = np.repeat(codes, n_years)
+            cols = np.tile(np.arange(n_years), len(codes))
+            pay = sum_by_cell(rows, cols, pay.ravel().astype(float), (len(unique_names), n_years)).astype(pay.dtype)
+            names = np.asarray(unique_names, dtype=object)
+            if sources is not None:
+                merged = [set() for _ in range(len(unique_names))]
+                for code, source in zip(codes, sources):
+                    merged[code].add(source)
+                sources = ['+'.join(sorted(row_sources)) for row_sources in merged]
+        return cls(names, blocks[0].years, pay, blocks[0].column, sources)
+
+    def __len__(self):
+        return len(self.names)
+
+    def year_range(self, min_year, max_year):
+        i0 = np.searchsorted(self.years, min_year, side='left')
+        i1 = np.searchsorted(self.years, max_year, side='right')
+        return PayBlock(self.names, self.years[i0:i1], self.pay[:, i0:i1], self.column, self.sources)
+
+    def subset(self, mask):
+        return PayBlock(self.names[mask], self.years, self.pay[mask], self.column, None if self.sources is None else self.sources[mask])
+
+    def has_data(self):
+        return ~np.isnan(self.pay).all(axis=1)
+
+    def spanning(self):
+        # has data for both the first and last year of the block
+        if self.pay.shape[1] == 0:
+            return np.zeros(len(self.names), dtype=bool)
+        return ~np.isnan(self.pay[:, 0]) & ~np.isnan(self.pay[:, -1])
@@ -0,0 +1,36 @@
+import numpy as np
+
+from schema import DataSchema
+from ingest import PAY_COLUMNS
+
+# ------------- UC-wide percentile bands ----------------
+# pay percentiles of all employees per year, for each compensation column; computed once (by build_data.py into the
+# manifest, or at load) with a grouped quantile over the employee-year rows, and only sliced to the year range per request
+# in disk mode the rows are never all in memory: percentile_bands_from_dataset reads one year at a time
+
+PERCENTILES = [10, 25, 50, 75, 90]
+
+def percentile_bands(df, years, percentiles = PERCENTILES):
+    # {column: {'years': [...], 'p10': [...], ...}} (None for years without data), json-friendly for the manifest
+    year_values = df[DataSchema.YEAR].astype(int).to_numpy()
+    bands = {}
+    for column in PAY_COLUMNS:
+        quantiles = df[column].groupby(year_values).quantile([p/100 for p in percentiles]).unstack().reindex(list(years))
+        bands[column] = {'years': [int(year) for year in years]}
+        for p, q in zip(percentiles, quantiles.columns):
+            bands[column]['p' + str(p)] = [None if np.isnan(value) else float(value) for value in quantiles[q].to_numpy(dtype=float)]
+    return bands
+
+def percentile_bands_from_dataset(dataset, years, percentiles = PERCENTILES):
+    # same result from a pyarrow dataset (disk mode), reading the pay columns of one year at a time
+    import pyarrow.dataset as ds        # deferred, like disk_store
+    bands = {column: {'years': [int(year) for year in years]} | {'p' + str(p): [] for p in percentiles} for column in PAY_COLUMNS}
+    for year in years:
+        table = dataset.to_table(columns = PAY_COLUMNS, filter = ds.field(DataSchema.YEAR) == int(year))
+        for column in PAY_COLUMNS:
+            values = table.column(column).to_numpy(zero_copy_only=False).astype(float)
+            values = values[~np.isnan(values)]
+            quantiles = np.percentile(values, percentiles) if len(values) > 0 else [np.nan]*len(percentiles)
+            for p, value in zip(percentiles, quantiles):
+                bands[column]['p' + str(p)].append(None if np.isnan(value) else float(value))
+    return bands
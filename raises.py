@@ -0,0 +1,123 @@
+import threading
+
+import numpy as np
+
+from schema import DataSchema
+
+# ------------- raise inequality over all employees ----------------
+# for every employee with pay in both min_year and max_year: the absolute (max - min year pay) and percentage raise,
+# summarized as histograms, raises per starting pay decile, and the largest absolute raises
+# one summary is a couple of vectorized passes over two year columns (of the names pay matrix, or read from the artifact
+# in disk mode); there are only 55 year ranges (x 2 compensation columns), so each summary is computed on first use and kept
+
+N_DECILES = 10
+HISTOGRAM_BINS = 40
+TOP_K = 20
+HISTOGRAM_RANGE = (1, 99)       # percentiles the histogram bins span; raises outside are counted in the end bins
+
+def histogram(values, bins = HISTOGRAM_BINS):
+    if len(values) == 0:
+        return {'edges': [], 'counts': []}
+    low, high = np.percentile(values, HISTOGRAM_RANGE)
+    if high <= low:
+        high = low + 1
+    counts, edges = np.histogram(np.clip(values, low, high), bins=bins, range=(low, high))
+    return {'edges': edges.tolist(), 'counts': counts.tolist()}
+
+def decile_summary(start, absolute, percent, n_deciles = N_DECILES):
+    # employees split into starting pay deciles (sorted by starting pay, so each decile is a contiguous slice)
+    order = np.argsort(start, kind='stable')
+    bounds = np.linspace(0, len(order), n_deciles + 1).astype(np.int64)
+    deciles = []
+    for i in range(n_deciles):
+        rows = order[bounds[i]:bounds[i + 1]]
+        if len(rows) == 0:
+            continue
+        deciles.append({
+            'decile': i + 1,
+            'count': int(len(rows)),
+            'start_min': float(start[rows[0]]),
+            'start_max': float(start[rows[-1]]),
+            'median_start': float(np.median(start[rows])),
+            'median_absolute': float(np.median(absolute[rows])),
+            'mean_absolute': float(np.mean(absolute[rows])),
+            'median_percent': float(np.median(percent[rows])),
+        })
+    return deciles
+
+def raise_summary(names, start, end, min_year, max_year, top_k = TOP_K):
+    # start, end: pay of every entity in min_year and max_year (NaN where missing); json-friendly result
+    start = np.asarray(start, dtype=float)
+    end = np.asarray(end, dtype=float)
+    ids = np.flatnonzero(~np.isnan(start) & ~np.isnan(end) & (start > 0))      # spanning the range (percentages need start > 0)
+    start, end = start[ids], end[ids]
+    absolute = end - start
+    percent = 100*absolute/start
+
+    # largest absolute raises: partial sort, then order the k
+    k = min(top_k, len(ids))
+    top = np.argpartition(-absolute, k - 1)[:k] if k > 0 else np.array([], dtype=np.int64)
+    top = top[np.argsort(-absolute[top], kind='stable')]
+
+    return {
+        'years': [int(min_year), int(max_year)],
+        'count': int(len(ids)),
+        'median_absolute': float(np.median(absolute)) if len(ids) > 0 else None,
+        'median_percent': float(np.median(percent)) if len(ids) > 0 else None,
+        'absolute_histogram': histogram(absolute),
+        'percent_histogram': histogram(percent),
+        'deciles': decile_summary(start, absolute, percent),
+        'top': [{
+            DataSchema.NAME: str(names[ids[i]]),
+            'start': float(start[i]),
+            'end': float(end[i]),
+            'absolute': float(absolute[i]),
+            'percent': float(percent[i]),
+        } for i in top],
+    }
+
+class RaiseEngine:
+    def __init__(self, names, years, read_years):
+        self.names = np.asarray(names, dtype=object)
+        self.years = np.asarray(years, dtype=int)
+        self.read_years = read_years        # (column, min_year, max_year) -> (start pay, end pay) per entity
+        self._summaries = {}    # (column, min_year, max_year) -> summary
+        self._lock = threading.Lock()
+
+    @classmethod
+    def from_matrix(cls, matrix):
+        # two column views of the names PayMatrix
+        def read_years(column, min_year, max_year):
+            pay = matrix.pay[column]
+            return pay[:, np.searchsorted(matrix.years, min_year)], pay[:, np.searchsorted(matrix.years, max_year)]
+        return cls(matrix.names, matrix.years, read_years)
+
+    @classmethod
+    def from_disk(cls, store):
+        # disk mode: only the rows of the two years are read from the artifact, scattered into two entity-length arrays
+        import pyarrow.dataset as ds        # deferred, like disk_store
+        def read_years(column, min_year, max_year):
+            table = store.dataset.to_table(columns = [DataSchema.ENTITY_ID, DataSchema.YEAR, column],
+                filter = ds.field(DataSchema.YEAR).isin([int(min_year), int(max_year)]))
+            entity_ids = table.column(DataSchema.ENTITY_ID).to_numpy()
+            year = table.column(DataSchema.YEAR).to_numpy()
+            pay = table.column(column).to_numpy(zero_copy_only=False)
+            start = np.full(len(store.names), np.nan, dtype=np.float32)
+            end = np.full(len(store.names), np.nan, dtype=np.float32)
+            start[entity_ids[year == min_year]] = pay[year == min_year]
+            end[entity_ids[year == max_year]] = pay[year == max_year]
+            return start, end
+        return cls(store.names, store.years, read_years)
+
+    def summary(self, column, min_year, max_year):
+        key = (column, int(min_year), int(max_year))
+        with self._lock:
+            if key in self._summaries:
+                return self._summaries[key]
+        if min_year >= max_year:
+            return None
+        start, end = self.read_years(column, min_year, max_year)
+        result = raise_summary(self.names, start, end, min_year, max_year)
+        with self._lock:
+            self._summaries[key] = result
+        return result
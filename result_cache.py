@@ -0,0 +1,75 @@
+import collections
+import json
+import threading
+
+import plotly.utils
+
+# ------------- process-wide result cache ----------------
+# most visitors look at the same few views (e.g. the default jobs), so the figure data for a normalized query is
+# computed once per process and shared across sessions
+# bounded by entries and (approximate, json-encoded) bytes, least recently used first out
+# keys include the dataset versions, so a rebuilt dataset never serves stale results
+
+def query_key(versions, names, years, compensation):
+    # normalized: the order in which names were added doesn't matter
+    # names: qualified by their dataset (PayBlock.labels), so the same string from the jobs and names datasets differs
+    return (tuple(versions), tuple(sorted([str(name) for name in names])), int(years[0]), int(years[-1]), compensation)
+
+def json_size(value):
+    return len(json.dumps(value, cls=plotly.utils.PlotlyJSONEncoder))
+
+class ResultCache:
+    def __init__(self, max_bytes, max_entries = 1000):
+        self.max_bytes = max_bytes
+        self.max_entries = max_entries
+        self._entries = collections.OrderedDict()       # key -> (value, size)
+        self._bytes = 0
+        self._lock = threading.Lock()
+        self.stats = {'hits': 0, 'misses': 0, 'evictions': 0}
+
+    def get(self, key):
+        with self._lock:
+            if key not in self._entries:
+                self.stats['misses'] += 1
+                return None
+            self._entries.move_to_end(key)
+            self.stats['hits'] += 1
+            return self._entries[key][0]
+
+    def contains(self, key):
+        # without counting a hit or miss (the lookup that uses the value does)
+        with self._lock:
+            return key in self._entries
+
+    def put(self, key, value):
+        size = json_size(value)
+        if size > self.max_bytes:
+            return value
+        with self._lock:
+            if key in self._entries:
+                self._bytes -= self._entries.pop(key)[1]
+            self._entries[key] = (value, size)
+            self._bytes += size
+            while (self._bytes > self.max_bytes) or (len(self._entries) > self.max_entries):
+                _, (_, evicted_size) = self._entries.popitem(last=False)
+                self._bytes -= evicted_size
+                self.stats['evictions'] += 1
+        return value
+
+    def get_or_compute(self, key, compute):
+        # for a caller whose get() already counted the miss: the re-check (another thread may have put it since)
+        # doesn't count it again
+        with self._lock:
+            if key in self._entries:
+                self._entries.move_to_end(key)
+                return self._entries[key][0]
+        return self.put(key, compute())
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+            self._bytes = 0
+
+    def get_stats(self):
+        with self._lock:
+            return dict(self.stats, entries=len(self._entries), bytes=self._bytes, max_bytes=self.max_bytes)
@@ -0,0 +1,14 @@
+# create schemas so that you don't need to remember the labels when coding
+class DataSchema:
+    NAME = "Employee Name"
+    JOB = "Job Title"
+    JOB_ABBREVIATED = "Abbreviated Job Title"
+    TOTAL_PAY = 'Total Pay'
+    TOTAL_PAY_AND_BENEFITS = 'Total Pay & Benefits'
+    PAY = 'Total Pay & Benefits'
+    YEAR = "Year"
+    PRIORPAY = "Prior Year Pay"
+    ADJUSTMENT = "Adjustment"
+    CUMADJUSTMENT = "Cumulative Adjustment"
+    PROJECTEDPAY = "Projected Pay"
+    ENTITY_ID = "Entity ID"
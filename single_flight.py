@@ -0,0 +1,93 @@
+import fcntl
+import hashlib
+import os
+import pickle
+import threading
+import time
+
+# ------------- request coalescing (single-flight) ----------------
+# when many sessions ask for the same thing at the same moment (e.g. a shared link), only the first one (the "leader")
+# does the work; the others wait for it and get the same result (or the same exception, e.g. PreventUpdate)
+#
+# with a directory, this also works across gunicorn workers: the leader holds an exclusive lock file for the key
+# and leaves the result behind for a few seconds, so workers that were waiting on the lock just read it
+
+class _Call:
+    def __init__(self):
+        self.done = threading.Event()
+        self.result = None
+        self.error = None
+
+def key_hash(key):
+    return hashlib.md5(repr(key).encode()).hexdigest()
+
+class SingleFlight:
+    def __init__(self, directory = None, result_ttl = 5):
+        self.directory = directory
+        self.result_ttl = result_ttl        # seconds a cross-worker result stays readable
+        self._lock = threading.Lock()
+        self._calls = {}
+        self.stats = {'leaders': 0, 'followers': 0}
+        if directory is not None:
+            os.makedirs(directory, exist_ok=True)
+
+    def do(self, key, fn):
+        with self._lock:
+            call = self._calls.get(key)
+            leader = call is None
+            if leader:
+                call = _Call()
+                self._calls[key] = call
+                self.stats['leaders'] += 1
+            else:
+                self.stats['followers'] += 1
+
+        if not leader:
+            call.done.wait()
+            if call.error is not None:
+                raise call.error
+            return call.result
+
+        try:
+            call.result = fn() if self.directory is None else self._do_across_workers(key, fn)
+            return call.result
+        except BaseException as e:
+            call.error = e
+            raise
+        finally:
+            with self._lock:
+                del self._calls[key]
+            call.done.set()
+
+    def _do_across_workers(self, key, fn):
+        path = os.path.join(self.directory, key_hash(key))
+        with open(path + '.lock', 'w') as lock_file:
+            fcntl.flock(lock_file, fcntl.LOCK_EX)
+            try:
+                # another worker finished the same work while we were waiting for the lock
+                try:
+                    if time.time() - os.path.getmtime(path + '.pkl') < self.result_ttl:
+                        with open(path + '.pkl', 'rb') as f:
+                            return pickle.load(f)
+                except (OSError, pickle.PickleError, EOFError):
+                    pass
+
+                result = fn()
+                tmp_path = path + '.pkl.tmp' + str(os.getpid())
+                with open(tmp_path, 'wb') as f:
+                    pickle.dump(result, f, protocol=pickle.HIGHEST_PROTOCOL)
+                os.replace(tmp_path, path + '.pkl')
+                return result
+            finally:
+                fcntl.flock(lock_file, fcntl.LOCK_UN)
+                if self.stats['leaders'] % 100 == 0:
+                    self.prune()
+
+    def prune(self):
+        # results are only meant for requests that were in flight at the same time
+        for entry in os.scandir(self.directory):
+            try:
+                if entry.name.endswith('.pkl') and (time.time() - entry.stat().st_mtime > self.result_ttl):
+                    os.remove(entry.path)
+            except OSError:
+                pass
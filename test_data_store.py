@@ -0,0 +1,23 @@
+import os
+
+from data_store import BoundedFileSystemStore, SharedDatasets
+
+def test_construct(tmp_path):
+    store = BoundedFileSystemStore(str(tmp_path), max_bytes=1024*1024)
+    assert store.get_stats()['evictions'] == 0
+
+def test_evict_keeps_count_file(tmp_path):
+    store = BoundedFileSystemStore(str(tmp_path), max_bytes=3000)
+    for i in range(5):
+        store.set('key' + str(i), b'x'*1000)
+    assert store.get_stats()['evictions'] > 0
+    count_file = os.path.basename(store._get_filename(store._fs_count_file))
+    assert count_file in os.listdir(str(tmp_path))
+
+def test_stale_reference_logged_once(capsys):
+    shared = SharedDatasets()
+    old_ref = shared.register('names', 'old frame', 'v1')
+    shared.register('names', 'new frame', 'v2')
+    assert shared.get(old_ref) == 'new frame'
+    assert shared.get(old_ref) == 'new frame'
+    assert capsys.readouterr().out.count('stale dataset reference') == 1
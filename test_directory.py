@@ -0,0 +1,39 @@
+import numpy as np
+
+from schema import DataSchema
+from directory import EmployeeDirectory, FIRST_YEAR, LAST_YEAR, YEARS_AVAILABLE, latest_label
+
+YEARS = [2011, 2012, 2013]
+LATEST_PAY = latest_label(DataSchema.TOTAL_PAY)
+
+def make_directory():
+    # a: 2011-2012, b: 2012-2013 (no pay in its last year), c: 2011-2013, d: 2013
+    latest_pay = {
+        DataSchema.TOTAL_PAY: np.array([10.0, np.nan, 30.0, 20.0]),
+        DataSchema.TOTAL_PAY_AND_BENEFITS: np.array([11.0, 5.0, 31.0, 21.0]),
+    }
+    return EmployeeDirectory(['a', 'b', 'c', 'd'], YEARS, [0b011, 0b110, 0b111, 0b100], latest_pay)
+
+def test_columns():
+    directory = make_directory()
+    assert directory.column(FIRST_YEAR, [0, 1, 2, 3]).tolist() == [2011, 2012, 2011, 2013]
+    assert directory.column(LAST_YEAR, [0, 1, 2, 3]).tolist() == [2012, 2013, 2013, 2013]
+    assert directory.column(YEARS_AVAILABLE, [0, 3]).tolist() == ['2011, 2012', '2013']
+
+def test_sort_pay_keeps_blank_last():
+    directory = make_directory()
+    assert directory.sort([0, 1, 2, 3], LATEST_PAY).tolist() == [0, 3, 2, 1]
+    assert directory.sort([0, 1, 2, 3], LATEST_PAY, descending = True).tolist() == [2, 3, 0, 1]
+
+def test_sort_name_and_years():
+    directory = make_directory()
+    assert directory.sort([2, 0, 3, 1], DataSchema.NAME).tolist() == [0, 1, 2, 3]
+    assert directory.sort([2, 0, 3, 1], DataSchema.NAME, descending = True).tolist() == [3, 2, 1, 0]
+    assert directory.sort([0, 1, 2, 3], YEARS_AVAILABLE).tolist() == [0, 2, 1, 3]
+
+def test_records():
+    records = make_directory().records([1])
+    assert records == [{
+        DataSchema.NAME: 'b', YEARS_AVAILABLE: '2012, 2013', FIRST_YEAR: 2012, LAST_YEAR: 2013,
+        LATEST_PAY: None, latest_label(DataSchema.TOTAL_PAY_AND_BENEFITS): 5.0,
+    }]
@@ -0,0 +1,99 @@
+import copy
+
+import numpy as np
+
+from figure_model import FigureModel, factor_trace
+
+LAYOUT = {'title': {'text': 'test'}}
+YEARS = [2011, 2012, 2013]
+
+def series(names, scale = 1):
+    # the data of a name only depends on the name (and scale), not on which other names are drawn
+    return {name: (YEARS, [scale*(ord(name[0]) + i) for i in range(len(YEARS))]) for name in names}
+
+def apply_delta(figure, delta):
+    # same as applyDelta in assets/figure_delta.js (without the bands): None if the delta doesn't fit the figure
+    if delta['reset']:
+        data = []
+    elif (figure is None) or (figure['version'] != delta['base']):
+        return None
+    else:
+        data = list(figure['data'])
+    for slot in delta['clear']:
+        data[slot] = dict(data[slot], x=[], y=[])
+    for slot, trace in delta['set']:
+        data.extend([None]*(slot + 1 - len(data)))
+        data[slot] = trace
+    return {'data': data, 'version': delta['version']}
+
+def drawn(figure):
+    return {trace['name']: trace['y'] for trace in figure['data'] if (trace is not None) and (len(trace['x']) > 0)}
+
+def test_first_update_resets():
+    model = FigureModel(YEARS, LAYOUT)
+    delta = model.update(series(['a', 'b']))
+    assert delta['reset'] and (delta['layout'] == LAYOUT) and (delta['base'] is None)
+    assert sorted([slot for slot, _ in delta['set']]) == [0, 1]
+    assert delta['clear'] == []
+
+def test_unchanged_update_is_empty():
+    model = FigureModel(YEARS, LAYOUT)
+    first = model.update(series(['a', 'b']))
+    delta = model.update(series(['a', 'b']))
+    assert not delta['reset'] and (delta['layout'] is None)
+    assert (delta['set'] == []) and (delta['clear'] == [])
+    assert delta['base'] == first['version']
+    assert delta['version'] != first['version']
+
+def test_removed_slot_is_reused():
+    model = FigureModel(YEARS, LAYOUT)
+    model.update(series(['a', 'b', 'c']))
+    slot_b = model.slots['b']
+    delta = model.update(series(['a', 'c']))
+    assert delta['clear'] == [slot_b]
+    delta = model.update(series(['a', 'c', 'd']))
+    assert [slot for slot, _ in delta['set']] == [slot_b]
+    assert delta['clear'] == []
+
+def test_changed_data_is_resent_in_place():
+    model = FigureModel(YEARS, LAYOUT)
+    model.update(series(['a', 'b']))
+    slots = dict(model.slots)
+    delta = model.update({'a': series(['a'])['a'], 'b': series(['b'], scale = 2)['b']})
+    assert [slot for slot, _ in delta['set']] == [slots['b']]
+    assert model.slots == slots
+
+def test_compacts_when_mostly_empty():
+    model = FigureModel(YEARS, LAYOUT, compact_threshold = 2)
+    model.update(series(list('abcdefghij')))
+    delta = model.update(series(['e']))
+    assert delta['reset'] and (delta['clear'] == [])
+    assert [slot for slot, _ in delta['set']] == [0]
+    assert model.slots == {'e': 0} and (model.n_slots == 1) and (model.free_slots == [])
+
+def test_factor_trace_leaves_y_to_the_browser():
+    model = FigureModel(YEARS, LAYOUT, trace = factor_trace)
+    delta = model.update({'a': (YEARS, [1.0, 1.1, 1.2])})
+    trace = delta['set'][0][1]
+    assert (trace['y'] == []) and (trace['customdata'] == [1.0, 1.1, 1.2])
+
+def test_deltas_replay_to_the_wanted_figure():
+    # random additions, removals and data changes: the figure rebuilt from the deltas always draws exactly the series
+    rng = np.random.default_rng(0)
+    pool = [chr(ord('a') + i) + str(i) for i in range(26)]
+    model = FigureModel(YEARS, LAYOUT, compact_threshold = 4)
+    figure = None
+    for _ in range(200):
+        names = list(rng.choice(pool, size=rng.integers(0, len(pool)), replace=False))
+        wanted = series(names, scale = int(rng.integers(1, 3)))
+        figure = apply_delta(figure, model.update(wanted))
+        assert figure is not None
+        assert drawn(figure) == {name: list(y) for name, (_, y) in wanted.items()}
+
+def test_delta_on_another_version_is_rejected():
+    # two updates built on the same model (e.g. a stale copy) can't both be applied
+    model = FigureModel(YEARS, LAYOUT)
+    figure = apply_delta(None, model.update(series(['a'])))
+    stale = copy.deepcopy(model)
+    figure = apply_delta(figure, model.update(series(['a', 'b'])))
+    assert apply_delta(figure, stale.update(series(['a', 'c']))) is None
@@ -0,0 +1,37 @@
+import numpy as np
+import pandas as pd
+
+from schema import DataSchema
+from ingest import aggregate_duplicates
+
+YEAR_TYPE = pd.api.types.CategoricalDtype(categories=[2011, 2012], ordered=True)
+
+def make_frame():
+    return pd.DataFrame({
+        DataSchema.NAME: ['c', 'b', 'a', 'b', 'c', None],
+        DataSchema.YEAR: [2012, 2011, 2011, 2011, 2030, 2011],
+        DataSchema.TOTAL_PAY: [30.0, 10.0, 1.0, 5.0, 99.0, 99.0],
+        DataSchema.TOTAL_PAY_AND_BENEFITS: [31.0, np.nan, 2.0, 6.0, 99.0, 99.0],
+    })
+
+def test_duplicates_are_summed_once():
+    df, report = aggregate_duplicates(make_frame(), YEAR_TYPE)
+    assert df[DataSchema.NAME].astype(str).tolist() == ['a', 'b', 'c']
+    assert df[DataSchema.YEAR].astype(int).tolist() == [2011, 2011, 2012]
+    assert df[DataSchema.TOTAL_PAY].tolist() == [1.0, 15.0, 30.0]
+    assert df[DataSchema.TOTAL_PAY_AND_BENEFITS].tolist() == [2.0, 6.0, 31.0]      # a missing value doesn't blank the sum
+    assert report == {
+        'rows_in': 6, 'rows_out': 3, 'rows_out_of_range': 2, 'duplicate_rows': 2, 'rows_merged': 1,
+        'entities': 3, 'ambiguous_names': 1, 'ambiguous_name_examples': ['b'],
+    }
+
+def test_entity_ids_are_name_codes():
+    df, _ = aggregate_duplicates(make_frame(), YEAR_TYPE)
+    assert list(df[DataSchema.NAME].cat.categories) == ['a', 'b', 'c']
+    assert df[DataSchema.ENTITY_ID].tolist() == df[DataSchema.NAME].cat.codes.tolist()
+    assert isinstance(df[DataSchema.YEAR].dtype, pd.CategoricalDtype)
+
+def test_no_duplicates():
+    df, report = aggregate_duplicates(make_frame().iloc[[0, 2]], YEAR_TYPE)
+    assert len(df) == 2
+    assert (report['rows_merged'] == 0) and (report['ambiguous_names'] == 0) and (report['ambiguous_name_examples'] == [])
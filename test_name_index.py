@@ -0,0 +1,53 @@
+import pandas as pd
+
+from name_index import NameIndex, normalize_name
+
+NAMES = ['Adam Ma', 'Beda Uuma', 'Ma Li', 'Mark Smith', 'Zed Mab']      # sorted, so ids follow the names
+
+def make_index():
+    return NameIndex(NAMES, [1]*len(NAMES), [2011])
+
+def test_normalize_name():
+    assert normalize_name('  Mark   SMITH ') == 'mark smith'
+
+def test_search_substring():
+    index = make_index()
+    assert index.search('MARK') == [3]
+    assert index.search('mab') == [4]
+    assert index.search('ma') == [0, 1, 2, 3, 4]       # shorter than a trigram: scans the keys
+    assert index.search('smyth') == []
+    assert index.search('  ') == []
+
+def test_search_limit_and_candidates():
+    index = make_index()
+    assert len(index.search('ma', limit = 2)) == 2
+    assert index.search('ma', candidates = [0, 1]) == [0, 1]
+
+def test_sort_matches():
+    # starting with the query first, then shorter, then alphabetical
+    index = make_index()
+    assert index.sort_matches('ma', index.search('ma')).tolist() == [2, 3, 0, 4, 1]
+
+def test_sort_matches_limit_keeps_the_best():
+    index = make_index()
+    ranked = index.sort_matches('ma', index.search('ma')).tolist()
+    for limit in range(1, len(NAMES) + 1):
+        assert index.sort_matches('ma', index.search('ma'), limit = limit).tolist() == ranked[:limit]
+    # the best matches are kept whatever order they came in
+    assert index.sort_matches('ma', [1, 4, 0, 3, 2], limit = 2).tolist() == [2, 3]
+
+def test_rank_misspelled():
+    index = make_index()
+    assert index.rank('mrak smith')[0][0] == 3
+
+def test_rank_prefers_matches_as_typed():
+    index = make_index()
+    ranked = index.rank('ma', k = 3)
+    assert ranked[0][0] == 2
+    assert [score for _, score in ranked] == sorted([score for _, score in ranked], reverse=True)
+
+def test_from_frame_years_mask():
+    df = pd.DataFrame({'name': ['b', 'a', 'b'], 'year': [2011, 2012, 2013]})
+    index = NameIndex.from_frame(df, 'name', 'year', [2011, 2012, 2013])
+    assert list(index.names) == ['a', 'b']
+    assert index.years_mask.tolist() == [0b010, 0b101]
@@ -0,0 +1,50 @@
+import numpy as np
+import pandas as pd
+
+from schema import DataSchema
+from pay_matrix import PayMatrix, PayBlock
+
+YEARS = [2011, 2012, 2013]
+nan = np.nan
+
+def make_frame():
+    return pd.DataFrame({
+        DataSchema.NAME: ['b', 'a', 'b', 'b', 'a'],
+        DataSchema.YEAR: [2011, 2012, 2011, 2013, 2020],      # 2020 is outside the year domain
+        DataSchema.TOTAL_PAY: [10.0, 20.0, 5.0, nan, 99.0],
+        DataSchema.TOTAL_PAY_AND_BENEFITS: [11.0, 21.0, 6.0, 30.0, 99.0],
+    })
+
+def test_from_frame_sums_duplicates():
+    matrix = PayMatrix.from_frame(make_frame(), YEARS)
+    assert list(matrix.names) == ['a', 'b']
+    np.testing.assert_array_equal(matrix.pay[DataSchema.TOTAL_PAY], [[nan, 20, nan], [15, nan, nan]])
+    np.testing.assert_array_equal(matrix.pay[DataSchema.TOTAL_PAY_AND_BENEFITS], [[nan, 21, nan], [17, nan, 30]])
+
+def test_select_and_year_range():
+    matrix = PayMatrix.from_frame(make_frame(), YEARS)
+    block = matrix.select(['b', 'missing'], DataSchema.TOTAL_PAY_AND_BENEFITS)
+    assert block.names.tolist() == ['b']
+    narrowed = block.year_range(2012, 2013)
+    assert narrowed.years.tolist() == [2012, 2013]
+    np.testing.assert_array_equal(narrowed.pay, [[nan, 30]])
+
+def test_spanning_and_has_data():
+    block = PayBlock(['a', 'b', 'c'], YEARS, np.array([[1, nan, 3], [1, 2, nan], [nan, nan, nan]]))
+    assert block.spanning().tolist() == [True, False, False]
+    assert block.has_data().tolist() == [True, True, False]
+
+def test_concat_sums_the_same_name():
+    jobs = PayBlock(['x', 'y'], YEARS, np.array([[1.0, nan, 3.0], [4.0, 5.0, 6.0]])).tagged('jobs')
+    names = PayBlock(['x', 'z'], YEARS, np.array([[10.0, nan, nan], [7.0, 8.0, 9.0]])).tagged('names')
+    block = PayBlock.concat([jobs, None, names])
+    assert block.names.tolist() == ['x', 'y', 'z']
+    np.testing.assert_array_equal(block.pay, [[11, nan, 3], [4, 5, 6], [7, 8, 9]])
+    assert block.sources.tolist() == ['jobs+names', 'jobs', 'names']
+    assert block.labels() == ['jobs+names:x', 'jobs:y', 'names:z']
+
+def test_concat_without_duplicates_keeps_rows():
+    block = PayBlock.concat([PayBlock(['x'], YEARS, np.array([[1.0, 2.0, 3.0]])), PayBlock(['y'], YEARS, np.array([[4.0, 5.0, 6.0]]))])
+    assert block.names.tolist() == ['x', 'y']
+    assert block.sources is None
+    assert PayBlock.concat([None]) is None
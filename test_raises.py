@@ -0,0 +1,45 @@
+import numpy as np
+
+from schema import DataSchema
+from pay_matrix import PayMatrix
+from raises import RaiseEngine, raise_summary
+
+nan = np.nan
+
+def test_raise_summary_spanning_only():
+    # c has no start pay, d starts at 0 (no percentage): neither is counted
+    summary = raise_summary(['a', 'b', 'c', 'd'], [100, 200, nan, 0], [150, 180, 300, 50], 2011, 2015)
+    assert summary['years'] == [2011, 2015]
+    assert summary['count'] == 2
+    assert summary['median_absolute'] == 15
+    assert summary['median_percent'] == 20
+    assert [row[DataSchema.NAME] for row in summary['top']] == ['a', 'b']
+    assert summary['top'][1] == {DataSchema.NAME: 'b', 'start': 200, 'end': 180, 'absolute': -20, 'percent': -10}
+    assert sum(summary['absolute_histogram']['counts']) == 2
+    assert sum([decile['count'] for decile in summary['deciles']]) == 2
+
+def test_raise_summary_top_k():
+    rng = np.random.default_rng(0)
+    start = rng.uniform(1000, 2000, 500)
+    end = start + rng.uniform(-500, 500, 500)
+    summary = raise_summary(np.arange(500).astype(str), start, end, 2011, 2012, top_k = 5)
+    expected = np.argsort(-(end - start), kind='stable')[:5]
+    assert [row[DataSchema.NAME] for row in summary['top']] == [str(i) for i in expected]
+    assert summary['count'] == 500
+    assert sum([decile['count'] for decile in summary['deciles']]) == 500
+    assert [decile['decile'] for decile in summary['deciles']] == list(range(1, 11))
+
+def test_raise_summary_empty():
+    summary = raise_summary(['a'], [nan], [nan], 2011, 2012)
+    assert (summary['count'] == 0) and (summary['median_absolute'] is None) and (summary['top'] == [])
+    assert summary['absolute_histogram'] == {'edges': [], 'counts': []}
+
+def test_engine_from_matrix_caches_summaries():
+    years = [2011, 2012, 2013]
+    pay = np.array([[100, 110, 120], [200, nan, 150]], dtype=np.float32)
+    engine = RaiseEngine.from_matrix(PayMatrix(['a', 'b'], years, {DataSchema.TOTAL_PAY: pay}))
+    summary = engine.summary(DataSchema.TOTAL_PAY, 2011, 2013)
+    assert summary['count'] == 2
+    assert [row[DataSchema.NAME] for row in summary['top']] == ['a', 'b']
+    assert engine.summary(DataSchema.TOTAL_PAY, 2011, 2013) is summary
+    assert engine.summary(DataSchema.TOTAL_PAY, 2012, 2012) is None
@@ -0,0 +1,22 @@
+from result_cache import ResultCache, query_key
+
+def test_cold_view_counts_one_miss():
+    cache = ResultCache(1024*1024)
+    key = query_key(['v1', 'v2'], ['names:b', 'jobs:a'], [2011, 2015], 'Total Pay')
+    assert cache.get(key) is None
+    assert cache.get_or_compute(key, lambda: {'x': 1}) == {'x': 1}
+    assert cache.get(key) == {'x': 1}
+    stats = cache.get_stats()
+    assert (stats['misses'] == 1) and (stats['hits'] == 1) and (stats['entries'] == 1)
+
+def test_query_key_ignores_name_order():
+    assert query_key(['v'], ['a', 'b'], [2011, 2015], 'c') == query_key(['v'], ['b', 'a'], [2011, 2015], 'c')
+
+def test_evicts_least_recently_used():
+    cache = ResultCache(1024*1024, max_entries = 2)
+    cache.put('a', 1)
+    cache.put('b', 2)
+    cache.get('a')
+    cache.put('c', 3)
+    assert cache.contains('a') and cache.contains('c') and not cache.contains('b')
+    assert cache.get_stats()['evictions'] == 1
@@ -0,0 +1,52 @@
+import numpy as np
+import pandas as pd
+
+import wage_engine
+from pay_matrix import PayBlock
+
+YEARS = [2011, 2012, 2013, 2014, 2015]
+
+def loop_projection(pay, initial_wage):
+    # the per-name loop update_figures used before the wage engine, over the years a name has pay for
+    pay = pd.Series(pay)
+    priorpay = pay.shift(1).to_numpy()
+    pay = pay.to_numpy()
+    priorpay[0] = pay[0]
+    adjustment = (pay - priorpay)/priorpay + 1
+    return (pd.Series(adjustment).cumprod()*initial_wage).to_numpy()
+
+def make_block():
+    rng = np.random.default_rng(0)
+    pay = rng.uniform(20000, 200000, size=(6, len(YEARS)))
+    pay[3, :2] = np.nan         # starts later
+    pay[4, 2] = np.nan          # gap
+    pay[5, :] = np.nan          # no pay at all
+    return PayBlock(['a', 'b', 'c', 'd', 'e', 'f'], YEARS, pay)
+
+def test_cumulative_adjustments_match_the_loop():
+    block = make_block()
+    projected = wage_engine.cumulative_adjustments(block)*50000
+    for i in range(5):
+        present = ~np.isnan(block.pay[i])
+        np.testing.assert_allclose(projected[i, present], loop_projection(block.pay[i, present], 50000), rtol=1e-9)
+        assert np.isnan(projected[i, ~present]).all()
+    assert np.isnan(projected[5]).all()
+
+def test_adjustment_factors_drop_missing_years():
+    block = make_block()
+    factors = wage_engine.adjustment_factors(block, ['d', 'e'])
+    assert sorted(factors) == ['d', 'e']
+    years, values = factors['d']
+    assert years.tolist() == YEARS[2:]
+    assert values[0] == 1
+    years, _ = factors['e']
+    assert years.tolist() == [2011, 2012, 2014, 2015]
+
+def test_real_wages():
+    block = make_block()
+    series = wage_engine.real_wages(block)
+    assert len(series) == 6
+    years, values = series['a']
+    assert years.tolist() == YEARS
+    np.testing.assert_array_equal(values, block.pay[0])
+    assert len(series['f'][0]) == 0
@@ -0,0 +1,35 @@
+import numpy as np
+
+# ------------- wage engine ----------------
+# vectorized replacements for the per-name loops in update_figures
+# everything works on a dense (name x year) PayBlock in one pass, then gets split into per-name series at the end
+
+def cumulative_adjustments(block):
+    # adjustment = pay/prior year pay, cumulative adjustment = running product within each name
+    # the product telescopes to pay/first pay, so a missing year compounds over the gap instead of poisoning the product
+    pay = block.pay.astype(float)
+    present = ~np.isnan(pay)
+    first = np.argmax(present, axis=1)
+    first_pay = pay[np.arange(len(pay)), first]
+    with np.errstate(divide='ignore', invalid='ignore'):
+        cumadjustment = pay/first_pay[:, np.newaxis]
+    cumadjustment[~np.isfinite(cumadjustment)] = np.nan
+    return cumadjustment
+
+def split_series(names, years, values, wanted = None):
+    # dense rows -> {name: (years, values)} with the missing years dropped
+    series = {}
+    present = ~np.isnan(values)
+    for i, name in enumerate(names):
+        if (wanted is None) or (name in wanted):
+            series[name] = (years[present[i]], values[i, present[i]])
+    return series
+
+def real_wages(block, names = None):
+    wanted = None if names is None else set(names)
+    return split_series(block.names, block.years, block.pay.astype(float), wanted)
+
+def adjustment_factors(block, names = None):
+    # {name: (years, cumulative adjustment)}: the projected pay for any initial wage is just factor*initial wage
+    wanted = None if names is None else set(names)
+    return split_series(block.names, block.years, cumulative_adjustments(block), wanted)